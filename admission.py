@@ -0,0 +1,102 @@
+"""Admission control for the chat API.
+
+RateLimiter gives each client a token bucket, so one client cannot flood a
+worker.  ConcurrencyLimiter caps how many requests may do a kind of work at
+once (decoding uploaded photos), parking a bounded number of extras for a
+short while and turning the rest away straight away.  Callers answer a
+refusal with 429 and a Retry-After hint instead of letting requests pile up
+on the server's threads.
+"""
+import math, threading, time
+from collections import OrderedDict, deque
+
+
+class RateLimiter:
+    """Per-client token buckets: `rate` requests per second, bursts of up to `burst`.
+
+    A rate of 0 disables limiting.  Only the `max_clients` most recently seen
+    clients are tracked; a forgotten client starts again with a full bucket.
+    A request costing more than `burst` is allowed from a full bucket and
+    leaves it in debt, so the client waits until the whole cost is repaid.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, client, cost=1):
+        """Take `cost` tokens; returns 0 if allowed, else seconds until it would be"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            needed = min(cost, self.burst)
+            if tokens >= needed:
+                tokens -= cost
+                wait = 0
+            else:
+                wait = (needed - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clients(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """At most `max_active` holders at once.
+
+    Up to `max_waiting` more callers wait, each for at most `max_wait`
+    seconds, in arrival order; anyone beyond that is refused immediately.
+    """
+
+    def __init__(self, max_active, max_waiting, max_wait):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.active = 0
+        self._queue = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def waiting(self):
+        return len(self._queue)
+
+    def acquire(self):
+        """Take a slot; returns False if the wait queue is full or the wait timed out"""
+        with self._cond:
+            if not self._queue and self.active < self.max_active:
+                self.active += 1
+                return True
+            if len(self._queue) >= self.max_waiting:
+                return False
+            ticket = object()
+            self._queue.append(ticket)
+            admitted = self._cond.wait_for(
+                lambda: self._queue[0] is ticket and self.active < self.max_active, self.max_wait)
+            self._queue.remove(ticket)
+            if admitted:
+                self.active += 1
+            # The next waiter may now be at the head of the queue
+            self._cond.notify_all()
+            return admitted
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def retry_after(self):
+        """Seconds a refused caller should wait before trying again"""
+        return max(1, math.ceil(self.max_wait))
+
+    def stats(self):
+        return {'active': self.active, 'waiting': self.waiting,
+                'max_active': self.max_active, 'max_waiting': self.max_waiting}
@@ -1,21 +1,114 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, make_response, Response, g, url_for, send_from_directory, abort
 from flask_cors import CORS
-import json, re, random, os, base64
+import json, re, random, os, base64, csv, hashlib, hmac, io, math, mimetypes, time
+from html import escape
 from datetime import datetime
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from tfidf_model import load_or_build as load_or_build_tfidf
+from intent_router import IntentRouter, INTENTS
+from spelling import SpellingCorrector
+from retrieval import InvertedIndexRetriever, HybridRetriever
+from response_cache import LRUCache
+from kb_manager import KnowledgeBaseManager
+from student_store import StudentStore, find_usn
+from recognition_jobs import RecognitionJobQueue
 from PIL import Image
-import io
+from werkzeug.exceptions import HTTPException, TooManyRequests
+from werkzeug.middleware.proxy_fix import ProxyFix
+from face_index import FaceEmbeddingIndex, decode_thumbnail, image_to_payload
+from upload_store import UploadStore, dhash
+from admission import RateLimiter, ConcurrencyLimiter
+from query_analytics import QueryAnalytics
+from static_assets import AssetManifest, ENCODING_SUFFIXES
+from metrics import Registry, Histogram, Counter, Gauge
+import structured_log
 
 app = Flask(__name__)
 CORS(app)
 
-# Load knowledge base
-with open('knowledge.json', 'r', encoding='utf-8') as f:
-    KB = json.load(f)
+# JSON-lines logging through a queue, so a slow stdout never blocks a request
+structured_log.configure()
+log = structured_log.get_logger('app')
 
-# Enhanced Student database
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STUDENT_PHOTO_DIR = os.path.join(BASE_DIR, 'students')
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+# Hashed asset names change with their content, so browsers may keep them for a year
+STATIC_ASSET_MAX_AGE = 365 * 24 * 3600
+MODEL_CACHE_DIR = os.path.join(BASE_DIR, 'model_cache')
+STUDENT_DB_PATH = os.environ.get('BIET_STUDENT_DB', os.path.join(BASE_DIR, 'students.db'))
+FACE_MATCH_THRESHOLD = float(os.environ.get('BIET_FACE_MATCH_THRESHOLD', '0.85'))
+RESPONSE_CACHE_SIZE = int(os.environ.get('BIET_RESPONSE_CACHE_SIZE', '2048'))
+RESPONSE_CACHE_TTL = float(os.environ.get('BIET_RESPONSE_CACHE_TTL', '600'))
+CARD_CACHE_SIZE = int(os.environ.get('BIET_CARD_CACHE_SIZE', '1024'))
+# Bump whenever format_student_details changes its markup, so cached and revalidated cards re-render
+CARD_TEMPLATE_VERSION = 1
+RECOGNITION_WORKERS = int(os.environ.get('BIET_RECOGNITION_WORKERS', '2'))
+RECOGNITION_MAX_PENDING = int(os.environ.get('BIET_RECOGNITION_MAX_PENDING', '32'))
+# Recognition workers run at a lower CPU priority so text replies stay fast
+RECOGNITION_NICE = int(os.environ.get('BIET_RECOGNITION_NICE', '10'))
+# Jobs a worker has not finished by then are failed, freeing their queue slot
+RECOGNITION_JOB_TIMEOUT = float(os.environ.get('BIET_RECOGNITION_JOB_TIMEOUT', '120'))
+# Per-client token buckets (requests per second, burst); a rate of 0 disables the limit
+TEXT_RATE_LIMIT = float(os.environ.get('BIET_TEXT_RATE_LIMIT', '5'))
+TEXT_RATE_BURST = int(os.environ.get('BIET_TEXT_RATE_BURST', '20'))
+PHOTO_RATE_LIMIT = float(os.environ.get('BIET_PHOTO_RATE_LIMIT', '0.5'))
+PHOTO_RATE_BURST = int(os.environ.get('BIET_PHOTO_RATE_BURST', '5'))
+# Batch messages have a bucket of their own (messages per second), so a large
+# batch never leaves the client's chat bucket in debt
+BATCH_RATE_LIMIT = float(os.environ.get('BIET_BATCH_RATE_LIMIT', '10'))
+BATCH_RATE_BURST = int(os.environ.get('BIET_BATCH_RATE_BURST', '500'))
+# Photo uploads read and decoded at once per process, and how many more may queue for a slot
+PHOTO_SLOTS = int(os.environ.get('BIET_PHOTO_SLOTS', '2'))
+PHOTO_QUEUE = int(os.environ.get('BIET_PHOTO_QUEUE', '4'))
+PHOTO_QUEUE_WAIT = float(os.environ.get('BIET_PHOTO_QUEUE_WAIT', '2'))
+RECOGNITION_RETRY_AFTER = 5
+# Photo result event streams open at once per process; each holds a request thread until its job finishes
+JOB_STREAMS = int(os.environ.get('BIET_JOB_STREAMS', '4'))
+# Reverse proxies in front of the app, trusted for the client address (X-Forwarded-For)
+TRUSTED_PROXIES = int(os.environ.get('BIET_TRUSTED_PROXIES', '0'))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+JOB_EVENTS_TIMEOUT = 60
+# Requests larger than this are refused with 413 before the body is read
+MAX_UPLOAD_BYTES = int(float(os.environ.get('BIET_MAX_UPLOAD_MB', '8')) * 1024 * 1024)
+# JSON chat bodies larger than this (or of unknown length) can only carry a photo
+MAX_TEXT_BODY_BYTES = 16 * 1024
+UPLOAD_STORE_DIR = os.environ.get('BIET_UPLOAD_DIR', os.path.join(BASE_DIR, 'upload_store'))
+UPLOAD_STORE_MAX_BYTES = int(os.environ.get('BIET_UPLOAD_STORE_MB', '256')) * 1024 * 1024
+UPLOAD_STORE_MAX_AGE = int(os.environ.get('BIET_UPLOAD_STORE_DAYS', '30')) * 24 * 3600
+SSE_HEARTBEAT_SECONDS = 15
+# Streamed replies are sent in line-aligned chunks of about this many characters
+STREAM_CHUNK_CHARS = 200
+
+# Intents whose replies are picked at random
+UNCACHEABLE_INTENTS = {'greeting'}
+# Reply type of each category intent -> the knowledge base category it lists
+CATEGORY_INTENTS = {intent['name']: intent['category'] for intent in INTENTS if 'category' in intent}
+
+KNOWLEDGE_PATH = os.path.join(BASE_DIR, 'knowledge.json')
+JOBS_DB_PATH = os.environ.get('BIET_JOBS_DB', os.path.join(BASE_DIR, 'jobs.db'))
+WARM_UP_QUERIES = 20
+KB_WATCH_INTERVAL = float(os.environ.get('BIET_KB_WATCH_INTERVAL', '2'))
+ADMIN_TOKEN = os.environ.get('BIET_ADMIN_TOKEN', '')
+BATCH_MAX_MESSAGES = int(os.environ.get('BIET_BATCH_MAX_MESSAGES', '500'))
+ALTERNATIVES_COUNT = 3
+ALTERNATIVES_MIN_SCORE = 0.1
+# Live suggestions: the knowledge base questions and categories most clients were answered with
+ANALYTICS_CAPACITY = int(os.environ.get('BIET_ANALYTICS_CAPACITY', '1024'))
+SUGGESTIONS_COUNT = 6
+SUGGESTION_MIN_COUNT = int(os.environ.get('BIET_SUGGESTION_MIN_COUNT', '3'))
+DEFAULT_SUGGESTIONS = [
+    "What is the admission process for BE?",
+    "Tell me about fee structure",
+    "Which companies visit for placements?",
+    "What facilities are available?",
+    "How is Computer Science department?",
+    "Is there scholarship available?"
+]
+# Share of the lexical TF-IDF score in the hybrid lexical + LSA match score
+HYBRID_LEXICAL_WEIGHT = float(os.environ.get('BIET_HYBRID_LEXICAL_WEIGHT', '0.6'))
+
+# Seed records loaded into a fresh student store
 STUDENT_DATABASE = {
     "students": [
         {
@@ -127,36 +220,44 @@ STUDENT_DATABASE = {
 }
 
 class StudentRecognition:
-    def __init__(self, student_database):
-        self.student_db = student_database
-    
-    def recognize_student(self, image_data):
-        """Simulate student recognition from photo"""
-        try:
-            available_students = self.student_db.get('students', [])
-            if not available_students:
-                return None
-            
-            # Simulate photo processing delay
-            import time
-            time.sleep(1)
-            
-            # Return random student for demo
-            return random.choice(available_students)
-            
-        except Exception as e:
-            print(f"Recognition error: {e}")
-            return None
+    def __init__(self, store):
+        self.store = store
+    
+    def student_card(self, usn):
+        """Return (card_html, etag) for a USN, or (None, None).
+        
+        Cards are rendered once per record and template version: the cache key
+        and ETag include the stored record hash and CARD_TEMPLATE_VERSION, so
+        an updated record or card layout renders afresh.
+        """
+        with stage_seconds.time('card_render'):
+            rhash = self.store.get_record_hash(usn)
+            if rhash is None:
+                return None, None
+            key = (usn.upper(), CARD_TEMPLATE_VERSION, rhash)
+            card = card_cache.get(key)
+            if card is None:
+                student = self.store.get_by_usn(usn)
+                if not student:
+                    return None, None
+                card = self.format_student_details(student)
+                card_cache.put(key, card)
+            return card, f"{CARD_TEMPLATE_VERSION}-{rhash}"
     
     def format_student_details(self, student, uploaded_photo_data=None):
         """Create compact student record card"""
         if not student:
             return "❌ No student record found."
         
-        marks = student.get('marks', {})
+        field = lambda data, key: escape(str(data.get(key, 'N/A')))
+        marks = student.get('marks') or {}
+        fees = student.get('fees') or {}
+        info = student.get('additional_info') or {}
         sgpas = [data.get("sgpa", 0) for data in marks.values()]
         cgpa = sum(sgpas) / len(sgpas) if sgpas else 0
-        total_backlogs = sum([data.get("backlogs", 0) for data in marks.values()])
+        total_backlogs = sum(data.get("backlogs", 0) for data in marks.values())
+        fee_status = str(fees.get('status', ''))
+        clubs = ', '.join(escape(str(club)) for club in info.get('club_membership', []))
         
         return f"""
         <div class="student-record-card">
@@ -166,9 +267,9 @@ class StudentRecognition:
                         <i class="fas fa-user-graduate"></i>
                     </div>
                     <div class="student-details">
-                        <h3>{student.get('name', 'N/A')}</h3>
-                        <p class="usn">{student.get('usn', 'N/A')}</p>
-                        <p class="department">{student.get('department', 'N/A')}</p>
+                        <h3>{field(student, 'name')}</h3>
+                        <p class="usn">{field(student, 'usn')}</p>
+                        <p class="department">{field(student, 'department')}</p>
                     </div>
                 </div>
                 <div class="student-stats">
@@ -178,7 +279,7 @@ class StudentRecognition:
                     </div>
                     <div class="stat-item">
                         <span class="stat-label">Attendance</span>
-                        <span class="stat-value">{student.get('attendance', 'N/A')}</span>
+                        <span class="stat-value">{field(student, 'attendance')}</span>
                     </div>
                     <div class="stat-item">
                         <span class="stat-label">Backlogs</span>
@@ -190,15 +291,15 @@ class StudentRecognition:
             <div class="student-contact-info">
                 <div class="contact-item">
                     <i class="fas fa-envelope"></i>
-                    <span>{student.get('email', 'N/A')}</span>
+                    <span>{field(student, 'email')}</span>
                 </div>
                 <div class="contact-item">
                     <i class="fas fa-phone"></i>
-                    <span>{student.get('phone', 'N/A')}</span>
+                    <span>{field(student, 'phone')}</span>
                 </div>
                 <div class="contact-item">
                     <i class="fas fa-map-marker-alt"></i>
-                    <span>{student.get('address', 'N/A')}</span>
+                    <span>{field(student, 'address')}</span>
                 </div>
             </div>
 
@@ -214,21 +315,21 @@ class StudentRecognition:
                 <div class="fee-details">
                     <div class="fee-item">
                         <span>Status:</span>
-                        <span class="fee-status {student.get('fees', {}).get('status', '').lower()}">
-                            {student.get('fees', {}).get('status', 'N/A')}
+                        <span class="fee-status {escape(fee_status.lower())}">
+                            {escape(fee_status) or 'N/A'}
                         </span>
                     </div>
                     <div class="fee-item">
                         <span>Amount:</span>
-                        <span>{student.get('fees', {}).get('amount', 'N/A')}</span>
+                        <span>{field(fees, 'amount')}</span>
                     </div>
                     <div class="fee-item">
                         <span>Due Date:</span>
-                        <span>{student.get('fees', {}).get('due_date', 'N/A')}</span>
+                        <span>{field(fees, 'due_date')}</span>
                     </div>
                     <div class="fee-item">
                         <span>Scholarship:</span>
-                        <span>{student.get('fees', {}).get('scholarship', 'N/A')}</span>
+                        <span>{field(fees, 'scholarship')}</span>
                     </div>
                 </div>
             </div>
@@ -238,19 +339,19 @@ class StudentRecognition:
                 <div class="info-grid">
                     <div class="info-item">
                         <i class="fas fa-home"></i>
-                        <span>{student.get('additional_info', {}).get('hostel', 'N/A')}</span>
+                        <span>{field(info, 'hostel')}</span>
                     </div>
                     <div class="info-item">
                         <i class="fas fa-book"></i>
-                        <span>Library ID: {student.get('additional_info', {}).get('library_id', 'N/A')}</span>
+                        <span>Library ID: {field(info, 'library_id')}</span>
                     </div>
                     <div class="info-item">
                         <i class="fas fa-hands-helping"></i>
-                        <span>NSS Volunteer: {'Yes' if student.get('additional_info', {}).get('nss_volunteer') else 'No'}</span>
+                        <span>NSS Volunteer: {'Yes' if info.get('nss_volunteer') else 'No'}</span>
                     </div>
                     <div class="info-item">
                         <i class="fas fa-users"></i>
-                        <span>Clubs: {', '.join(student.get('additional_info', {}).get('club_membership', []))}</span>
+                        <span>Clubs: {clubs}</span>
                     </div>
                 </div>
             </div>
@@ -261,70 +362,123 @@ class StudentRecognition:
         if not marks:
             return '<p>No marks data available</p>'
         
-        html = '<div class="semester-grid">'
+        parts = ['<div class="semester-grid">']
         for sem, data in marks.items():
             sgpa = data.get("sgpa", 0)
             backlogs = data.get("backlogs", 0)
             status_class = "success" if backlogs == 0 else "warning"
             
-            html += f'''
+            parts.append(f'''
             <div class="semester-item {status_class}">
-                <span class="semester-name">{sem.replace('_', ' ').title()}</span>
-                <span class="semester-sgpa">SGPA: {sgpa}</span>
-                <span class="semester-backlogs">Backlogs: {backlogs}</span>
+                <span class="semester-name">{escape(sem.replace('_', ' ').title())}</span>
+                <span class="semester-sgpa">SGPA: {escape(str(sgpa))}</span>
+                <span class="semester-backlogs">Backlogs: {escape(str(backlogs))}</span>
             </div>
-            '''
-        html += '</div>'
-        return html
+            ''')
+        parts.append('</div>')
+        return ''.join(parts)
 
 # Initialize systems
-student_recognition = StudentRecognition(STUDENT_DATABASE)
+student_store = StudentStore(STUDENT_DB_PATH)
+if student_store.count() == 0:
+    student_store.upsert_many(STUDENT_DATABASE['students'])
+face_index = FaceEmbeddingIndex(STUDENT_PHOTO_DIR, MODEL_CACHE_DIR, threshold=FACE_MATCH_THRESHOLD)
+face_index.load_or_build(student_store.directory())
+student_recognition = StudentRecognition(student_store)
+card_cache = LRUCache(maxsize=CARD_CACHE_SIZE)
+# Fingerprinted, precompressed static files from `python static_assets.py`
+asset_manifest = AssetManifest(STATIC_DIR).load()
+
+def recognition_reply(usn):
+    """Turn a recognition job's USN into the chat reply"""
+    card = student_recognition.student_card(usn)[0] if usn else None
+    if card:
+        return card, 'student_record'
+    return "❌ No student recognized. Try a clearer photo.", 'error'
+
+recognition_jobs = RecognitionJobQueue(
+    (STUDENT_PHOTO_DIR, MODEL_CACHE_DIR, FACE_MATCH_THRESHOLD), recognition_reply,
+    max_workers=RECOGNITION_WORKERS, max_pending=RECOGNITION_MAX_PENDING, results_path=JOBS_DB_PATH,
+    nice=RECOGNITION_NICE, job_timeout=RECOGNITION_JOB_TIMEOUT
+)
+# Repeated (or near-identical) photos reuse the stored recognition result
+upload_store = UploadStore(UPLOAD_STORE_DIR, max_bytes=UPLOAD_STORE_MAX_BYTES, max_age=UPLOAD_STORE_MAX_AGE,
+                           index_key=face_index.version).load()
+response_cache = LRUCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+# Admission control: photos are rate limited harder and get a few decode slots,
+# so a burst of uploads cannot take every request thread away from text chat
+text_rate_limiter = RateLimiter(TEXT_RATE_LIMIT, TEXT_RATE_BURST)
+photo_rate_limiter = RateLimiter(PHOTO_RATE_LIMIT, PHOTO_RATE_BURST)
+batch_rate_limiter = RateLimiter(BATCH_RATE_LIMIT, BATCH_RATE_BURST)
+photo_slots = ConcurrencyLimiter(PHOTO_SLOTS, PHOTO_QUEUE, PHOTO_QUEUE_WAIT)
+job_streams = ConcurrencyLimiter(JOB_STREAMS, 0, 0)
+# Most frequent questions, and those nothing in the knowledge base answered
+query_analytics = QueryAnalytics(ANALYTICS_CAPACITY)
+
+# Prometheus metrics served on /metrics
+metrics_registry = Registry()
+stage_seconds = metrics_registry.register(Histogram(
+    'biet_stage_seconds', 'Latency of each chat pipeline stage', 'stage'))
+request_seconds = metrics_registry.register(Histogram(
+    'biet_request_seconds', 'Chat API request latency', 'endpoint'))
+responses_total = metrics_registry.register(Counter(
+    'biet_responses_total', 'Chat replies by response type', 'type'))
+metrics_registry.register(Gauge(
+    'biet_recognition_jobs_pending', 'Photo recognition jobs waiting or running', lambda: recognition_jobs.pending()))
+metrics_registry.register(Gauge(
+    'biet_photo_uploads_active', 'Photo uploads being read and decoded', lambda: photo_slots.active))
+metrics_registry.register(Gauge(
+    'biet_photo_uploads_waiting', 'Photo uploads queued for a decode slot', lambda: photo_slots.waiting))
+metrics_registry.register(Gauge(
+    'biet_job_streams_active', 'Open photo recognition event streams', lambda: job_streams.active))
+rejections_total = metrics_registry.register(Counter(
+    'biet_rejections_total', 'Requests turned away with 429 by admission control', 'reason'))
+metrics_registry.register(Gauge(
+    'biet_response_cache_hit_ratio', 'Response cache hit rate', lambda: response_cache.stats()['hit_rate']))
+metrics_registry.register(Gauge(
+    'biet_log_records_dropped_total', 'Log records dropped because the log queue was full',
+    structured_log.dropped_records, kind='counter'))
 
 class ChatbotEngine:
     def __init__(self, knowledge_base):
         self.kb = knowledge_base
+        self.router = IntentRouter(INTENTS)
         self.setup_nlp()
     
     def setup_nlp(self):
-        # Prepare questions and answers for TF-IDF
-        self.questions = []
-        self.answers = []
-        
-        # Add QA pairs from knowledge base
-        for qa in self.kb.get('qa_pairs', []):
-            self.questions.append(qa['question'])
-            self.answers.append(qa['answer'])
-        
-        # Add category-based questions
-        categories = ['admissions', 'courses', 'fee_structure', 'placements', 'facilities', 'departments']
-        for category in categories:
-            items = self.kb.get(category, [])
-            for item in items:
-                # Extract key terms to create synthetic questions
-                key_terms = self.extract_key_terms(item)
-                if key_terms:
-                    synthetic_question = f"what is {key_terms}"
-                    self.questions.append(synthetic_question)
-                    self.answers.append(f"**{category.replace('_', ' ').title()}:**\n\n{item}")
-        
-        if self.questions:
-            self.vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
-            self.tfidf_matrix = self.vectorizer.fit_transform(self.questions)
-        else:
-            self.vectorizer = None
-            self.tfidf_matrix = None
-    
-    def extract_key_terms(self, text):
-        """Extract key terms from text to create synthetic questions"""
-        # Remove emojis and special characters
-        clean_text = re.sub(r'[^\w\s]', ' ', text)
-        words = clean_text.split()
-        
-        # Filter out common words and get meaningful terms
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-        key_terms = [word for word in words if word.lower() not in stop_words and len(word) > 3]
-        
-        return ' '.join(key_terms[:4]) if key_terms else None
+        # Map the persisted TF-IDF artifact; refits only when knowledge.json changed
+        model = load_or_build_tfidf(self.kb, MODEL_CACHE_DIR)
+        self.kb_hash = model.content_hash
+        self.questions = model.questions
+        self.answers = model.answers
+        self.vectorizer = model.vectorizer
+        self.tfidf_matrix = model.tfidf_matrix
+        # Answer -> the knowledge base question it belongs to, for suggestions
+        self.answer_questions = {qa['answer']: qa['question'] for qa in reversed(self.kb.get('qa_pairs', []))}
+        self.retriever = None
+        if model.vectorizer:
+            self.retriever = HybridRetriever(
+                InvertedIndexRetriever(model.tfidf_matrix, model.postings), model.lsa,
+                lexical_weight=HYBRID_LEXICAL_WEIGHT
+            )
+        # Typo correction towards words retrieval or routing can match, rebuilt with the model;
+        # student names are read when the index is built, not here
+        self.speller = SpellingCorrector.for_vocabulary(
+            model.vectorizer, self.router.keywords,
+            names=lambda: [student['name'] for student in student_store.directory()])
+    
+    def warm_up(self):
+        """Exercise each retrieval path and build the lazy indexes"""
+        for question in self.questions[:WARM_UP_QUERIES]:
+            self.find_best_match(question)
+        self.find_best_matches(self.questions[:WARM_UP_QUERIES])
+        self.router.match('hello')
+        self.speller.build()
+    
+    def correct_spelling(self, text):
+        """Lowercased text with misspelled words corrected"""
+        with stage_seconds.time('spelling'):
+            return self.speller.correct(text)
     
     def preprocess_text(self, text):
         text = text.lower().strip()
@@ -332,89 +486,167 @@ class ChatbotEngine:
         return re.sub(r'\s+', ' ', text)
     
     def find_best_match(self, user_query):
-        if not hasattr(self, 'vectorizer') or self.vectorizer is None:
+        matches = self.find_top_matches(user_query, k=1)
+        if not matches:
             return None, 0.0
-        
-        processed_query = self.preprocess_text(user_query)
-        query_vector = self.vectorizer.transform([processed_query])
-        
-        similarities = cosine_similarity(query_vector, self.tfidf_matrix)
-        best_match_idx = np.argmax(similarities)
-        best_score = similarities[0, best_match_idx]
-        
-        return self.answers[best_match_idx], best_score
+        return matches[0][1], matches[0][2]
     
-    def generate_response(self, user_message, image_data=None):
-        user_message_lower = user_message.lower()
+    def find_top_matches(self, user_query, k=5):
+        """Return up to k (question, answer, score) matches, best first"""
+        if not hasattr(self, 'retriever') or self.retriever is None:
+            return []
         
-        # Handle photo recognition first
-        if image_data:
-            student = student_recognition.recognize_student(image_data)
-            if student:
-                return student_recognition.format_student_details(student, image_data), 'student_record'
-            return "❌ No student recognized. Try a clearer photo.", 'error'
-        
-        # Handle photo-related queries
-        if any(word in user_message_lower for word in ['student', 'photo', 'picture', 'recognize', 'camera', 'upload']):
-            return "📸 Upload a student photo using the camera button above to get student records!", 'photo_prompt'
-        
-        # Handle specific category queries with exact matching
-        category_response = self.handle_category_queries(user_message_lower)
-        if category_response:
-            return category_response
-        
-        # Use TF-IDF for general question matching
-        best_answer, score = self.find_best_match(user_message)
-        
-        if score > 0.3:
-            return best_answer, 'qa'
+        with stage_seconds.time('tfidf_transform'):
+            query_vector = self.vectorizer.transform([self.preprocess_text(user_query)])
         
-        # Handle greetings
-        if any(word in user_message_lower for word in ['hi', 'hello', 'hey', 'namaste', 'good morning', 'good afternoon']):
-            return random.choice(self.kb.get('greetings', [])), 'greeting'
+        with stage_seconds.time('similarity'):
+            hits = self.retriever.search(query_vector, k=k)
+        return [(self.questions[idx], self.answers[idx], score) for idx, score in hits]
+    
+    def did_you_mean(self, user_query, reply=None, k=ALTERNATIVES_COUNT):
+        """Other close knowledge base questions to offer alongside (or instead of) the reply.
         
-        # Handle thanks
-        if any(word in user_message_lower for word in ['thank', 'thanks', 'thank you']):
-            return "You're welcome! 😊 If you have more questions about BIET, feel free to ask!", 'general'
+        Only real questions are offered: the synthetic 'what is ...' entries
+        built from category items stay searchable but are never shown.
+        """
+        alternatives = []
+        for _, answer, score in self.find_top_matches(self.correct_spelling(user_query), k=2 * k + 1):
+            question = self.answer_questions.get(answer)
+            if question is not None and answer != reply and score >= ALTERNATIVES_MIN_SCORE:
+                alternatives.append({'question': question, 'score': round(score, 3)})
+        return alternatives[:k]
+    
+    def find_best_matches(self, user_queries):
+        """Vectorized find_best_match: one transform and one matrix product for all queries"""
+        if not hasattr(self, 'retriever') or self.retriever is None or not user_queries:
+            return [(None, 0.0)] * len(user_queries)
         
-        # Handle help requests
-        if any(word in user_message_lower for word in ['help', 'what can you do', 'options']):
-            return self.get_help_response(), 'help'
+        with stage_seconds.time('tfidf_transform'):
+            query_matrix = self.vectorizer.transform([self.preprocess_text(q) for q in user_queries])
+        with stage_seconds.time('similarity'):
+            best = self.retriever.best_matches(query_matrix)
+        return [(self.answers[idx], score) for idx, score in best]
+    
+    def generate_response(self, user_message):
+        # A USN in the message is an indexed record lookup
+        usn = find_usn(user_message)
+        if usn:
+            return self.lookup_student(usn)
         
-        # Handle contact requests
-        if any(word in user_message_lower for word in ['contact', 'phone', 'email', 'address', 'where are you', 'location']):
-            return self.get_contact_response(), 'contact'
+        # Repeat questions are served from the cache, scoped to this KB version
+        cache_key = (self.kb_hash, self.preprocess_text(user_message))
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        # Fallback to general response
-        return random.choice(self.kb.get('fallback_responses', [])), 'general'
+        return self.cache_answer(cache_key, self.answer_text(user_message))
     
-    def handle_category_queries(self, user_message_lower):
-        """Handle specific category queries with exact matching"""
+    def generate_responses(self, user_messages):
+        """Answer a batch of text messages in order.
         
-        # Admissions queries
-        if any(word in user_message_lower for word in ['admission', 'admit', 'apply', 'application', 'eligibility', 'cet', 'comedk']):
-            return self.get_category_response('admissions'), 'admissions'
+        Every message is routed first; those that fall through to retrieval
+        are scored together by find_best_matches.
+        """
+        results = [None] * len(user_messages)
+        pending = []
+        for idx, user_message in enumerate(user_messages):
+            usn = find_usn(user_message)
+            if usn:
+                results[idx] = self.lookup_student(usn)
+                continue
+            cache_key = (self.kb_hash, self.preprocess_text(user_message))
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                results[idx] = cached
+                continue
+            text = self.correct_spelling(user_message)
+            with stage_seconds.time('routing'):
+                intents = self.router.match(text)
+            answer = self.pre_retrieval_response(intents)
+            if answer is None:
+                pending.append((idx, cache_key, intents, text))
+            else:
+                results[idx] = self.cache_answer(cache_key, answer)
         
-        # Fee queries
-        if any(word in user_message_lower for word in ['fee', 'fees', 'cost', 'tuition', 'scholarship', 'payment']):
-            return self.get_category_response('fee_structure'), 'fees'
+        matches = self.find_best_matches([text for _, _, _, text in pending])
+        for (idx, cache_key, intents, _), (best_answer, score) in zip(pending, matches):
+            answer = self.post_retrieval_response(intents, best_answer, score)
+            results[idx] = self.cache_answer(cache_key, answer)
+        return results
+    
+    def lookup_student(self, usn):
+        card, _ = student_recognition.student_card(usn)
+        if card:
+            return card, 'student_record'
+        return f"❌ No student record found for USN {usn}.", 'error'
+    
+    def cache_answer(self, cache_key, answer):
+        response, response_type, cacheable = answer
+        if cacheable:
+            response_cache.put(cache_key, (response, response_type))
+        return response, response_type
+    
+    def answer_text(self, user_message):
+        """Answer a text message, returning (response, type, cacheable)"""
+        # Fix typos first ('admision', 'hostle'), so both the router and TF-IDF can match
+        text = self.correct_spelling(user_message)
         
-        # Placement queries
-        if any(word in user_message_lower for word in ['placement', 'placements', 'company', 'companies', 'recruiter', 'job', 'package', 'salary']):
-            return self.get_category_response('placements'), 'placements'
+        # One pass over the message finds every matching intent
+        with stage_seconds.time('routing'):
+            intents = self.router.match(text)
         
-        # Course queries
-        if any(word in user_message_lower for word in ['course', 'courses', 'program', 'b.e', 'm.tech', 'mca', 'mba', 'engineering']):
-            return self.get_category_response('courses'), 'courses'
+        answer = self.pre_retrieval_response(intents)
+        if answer is not None:
+            return answer
         
-        # Facility queries
-        if any(word in user_message_lower for word in ['facility', 'facilities', 'hostel', 'library', 'lab', 'sports', 'cafeteria', 'medical']):
-            return self.get_category_response('facilities'), 'facilities'
+        # Use TF-IDF for general question matching
+        best_answer, score = self.find_best_match(text)
+        return self.post_retrieval_response(intents, best_answer, score)
+    
+    def pre_retrieval_response(self, intents):
+        """Handle photo prompts and category queries before retrieval"""
+        pre_intent = next((i for i in intents if i['stage'] == 'pre'), None)
+        if pre_intent:
+            return self.handle_intent(pre_intent) + (pre_intent['name'] not in UNCACHEABLE_INTENTS,)
+        return None
+    
+    def post_retrieval_response(self, intents, best_answer, score):
+        if score > 0.3:
+            return best_answer, 'qa', True
         
-        # Department queries
-        if any(word in user_message_lower for word in ['department', 'departments', 'cse', 'computer science', 'mechanical', 'civil', 'electronics', 'electrical', 'chemical', 'biotechnology']):
-            return self.get_category_response('departments'), 'departments'
+        # Handle greetings, thanks, help and contact requests
+        post_intent = next((i for i in intents if i['stage'] == 'post'), None)
+        if post_intent:
+            return self.handle_intent(post_intent) + (post_intent['name'] not in UNCACHEABLE_INTENTS,)
         
+        # Fallback to general response (random, so never cached)
+        return random.choice(self.kb.get('fallback_responses', [])), 'general', False
+    
+    def is_fallback(self, response):
+        return response in self.kb.get('fallback_responses', [])
+    
+    def suggestion_for(self, response, response_type):
+        """The knowledge base question or category a reply came from, or None for any other reply"""
+        if response_type == 'qa':
+            return self.answer_questions.get(response)
+        category = CATEGORY_INTENTS.get(response_type)
+        return f"Tell me about {category.replace('_', ' ')}" if category else None
+    
+    def handle_intent(self, intent):
+        """Build the response for a routed intent"""
+        name = intent['name']
+        if 'category' in intent:
+            return self.get_category_response(intent['category']), name
+        if name == 'photo_prompt':
+            return "📸 Upload a student photo using the camera button above to get student records!", 'photo_prompt'
+        if name == 'greeting':
+            return random.choice(self.kb.get('greetings', [])), 'greeting'
+        if name == 'thanks':
+            return "You're welcome! 😊 If you have more questions about BIET, feel free to ask!", 'general'
+        if name == 'help':
+            return self.get_help_response(), 'help'
+        if name == 'contact':
+            return self.get_contact_response(), 'contact'
         return None
     
     def get_category_response(self, category):
@@ -469,55 +701,487 @@ class ChatbotEngine:
 
 **For specific department inquiries, please mention the department name.**"""
 
-chatbot = ChatbotEngine(KB)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+# Load knowledge base; reloads swap in a freshly built engine atomically
+kb_manager = KnowledgeBaseManager(KNOWLEDGE_PATH, ChatbotEngine, warm_up=ChatbotEngine.warm_up).load()
+# Set once warm_up() has run; /readyz reports not ready until then
+ready_since = None
+
+def warm_up():
+    """Run each answer path once so lazy imports and first-call setup happen
+    before serving (in the pre-fork master, once for every worker)"""
+    global ready_since
+    kb_manager.engine.warm_up()
+    student_store.count()
+    ready_since = datetime.now().isoformat(timespec='seconds')
 
 @app.route('/')
 def home():
     return render_template('index.html')
 
+@app.template_global()
+def asset_url(name):
+    """URL of a static file: its hashed build when current, else the file itself"""
+    return url_for('static', filename=asset_manifest.path(name))
+
+@app.template_global()
+def asset_sources(name):
+    """[(MIME type, srcset)] of a static image's responsive variants, best format first"""
+    return [(mime, ', '.join(f"{url_for('static', filename=path)} {width}w" for width, path in variants))
+            for mime, variants in asset_manifest.sources(name)]
+
+@app.route('/static/dist/<path:filename>')
+def built_asset(filename):
+    """Serve a hashed build, precompressed to match Accept-Encoding"""
+    encodings = asset_manifest.encodings(filename)
+    if encodings is None:
+        abort(404)
+    encoding = request.accept_encodings.best_match(encodings) if encodings else None
+    path = filename + ENCODING_SUFFIXES[encoding] if encoding else filename
+    response = send_from_directory(asset_manifest.build_dir, path, mimetype=mimetypes.guess_type(filename)[0],
+                                   max_age=STATIC_ASSET_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if encodings:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/api/chat', methods=['POST'])
 def chat_endpoint():
+    with request_seconds.time('chat'):
+        return chat_reply()
+
+def chat_reply():
     try:
-        data = request.get_json()
-        user_message = data.get('message', '').strip()
-        image_data = data.get('image', '')
-        
-        print(f"Received message: {user_message}")
-        print(f"Image data present: {bool(image_data)}")
+        user_message, upload = read_chat_request()
+        log.info('chat_request', extra={'text': user_message, 'has_image': bool(upload)})
         
-        response, response_type = chatbot.generate_response(user_message, image_data)
+        if upload:
+            try:
+                return recognize_upload(upload)
+            except (OSError, ValueError, Image.DecompressionBombError) as e:
+                return unreadable_upload_response(e, upload)
         
-        print(f"Response type: {response_type}")
+        engine = kb_manager.engine
+        response, response_type = engine.generate_response(user_message)
+        responses_total.inc(response_type)
+        record_query(engine, user_message, response, response_type)
+        log.info('chat_response', extra={'type': response_type})
         
         return jsonify({
             'reply': response,
             'type': response_type,
+            'alternatives': engine.did_you_mean(user_message, response) if wants_alternatives(response_type) else [],
             'timestamp': datetime.now().strftime('%H:%M')
         })
         
-    except Exception as e:
-        print(f"Error: {e}")
+    except HTTPException:
+        # e.g. 413 raised while the form parser reads an oversized body
+        raise
+    except Exception:
+        log.exception('chat_error')
+        responses_total.inc('error')
         return jsonify({
             'reply': 'Sorry, I encountered an error. Please try again.',
             'type': 'error'
         })
 
+def read_chat_request():
+    """Return (message, uploaded image bytes) from a JSON, multipart or raw image request.
+    
+    Admission control happens here: photo requests take a decode slot before
+    their body is read, text requests spend a token from the client's bucket.
+    Either may raise TooManyRequests (429).  A JSON body is treated as a
+    photo before it is read when it is too large to be a text message; a
+    small JSON body with a photo in it takes its slot once parsed.
+    """
+    if request.mimetype == 'multipart/form-data':
+        admit_photo()
+        upload = request.files.get('image')
+        return request.form.get('message', '').strip(), upload.read() if upload and upload.filename else b''
+    
+    if request.mimetype.startswith('image/'):
+        admit_photo()
+        return request.args.get('message', '').strip(), request.get_data(cache=False)
+    
+    # Older clients send the photo as a base64 data URL inside the JSON body
+    if request.content_length is None or request.content_length > MAX_TEXT_BODY_BYTES:
+        admit_photo()
+    data = request.get_json()
+    image = data.get('image', '')
+    if image:
+        admit_photo()
+    else:
+        admit_text()
+    if image.startswith('data:'):
+        image = image.split(',', 1)[1]
+    return data.get('message', '').strip(), base64.b64decode(image) if image else b''
+
+def wants_alternatives(response_type):
+    """Alternatives cost a second search, so they are only computed for clients asking with ?alternatives=1"""
+    return response_type in ('qa', 'general') and request.args.get('alternatives', 0, type=int) == 1
+
+def record_query(engine, user_message, response, response_type):
+    """Feed a text exchange to the query analytics; student lookups stay out of it"""
+    if find_usn(user_message):
+        return
+    query_analytics.record(engine.preprocess_text(user_message), user_message,
+                           topic=engine.suggestion_for(response, response_type), client=client_key(),
+                           answered=not engine.is_fallback(response))
+
+def client_key():
+    return request.remote_addr or 'unknown'
+
+def too_many_requests(reason, message, retry_after):
+    rejections_total.inc(reason)
+    log.info('request_rejected', extra={'reason': reason, 'client': client_key()})
+    return TooManyRequests(message, retry_after=max(1, math.ceil(retry_after)))
+
+def admit_text():
+    wait = text_rate_limiter.acquire(client_key())
+    if wait:
+        raise too_many_requests('text_rate', '⏳ You are sending messages too quickly. Please slow down.', wait)
+
+def admit_batch(size):
+    wait = batch_rate_limiter.acquire(client_key(), size)
+    if wait:
+        raise too_many_requests('batch_rate', '⏳ You are sending batches too quickly. Please slow down.', wait)
+
+def admit_photo():
+    """Take a photo decode slot for this request (freed at teardown), or raise 429"""
+    if g.get('photo_slot'):
+        return
+    wait = photo_rate_limiter.acquire(client_key())
+    if wait:
+        raise too_many_requests('photo_rate', '⏳ Too many photos at once. Please wait before sending another.', wait)
+    if not photo_slots.acquire():
+        raise too_many_requests('photo_queue', '⏳ Photo recognition is busy right now. Please try again in a few seconds.',
+                                photo_slots.retry_after())
+    g.photo_slot = True
+
+@app.teardown_request
+def release_photo_slot(error=None):
+    # Runs once the view returns, before a streamed reply waits on its job
+    if g.pop('photo_slot', False):
+        photo_slots.release()
+
+def inspect_upload(data):
+    """Look an uploaded photo up in the upload store.
+    
+    Returns (stored entry, None) when this photo (or a near-identical one) was
+    recognized before, else (None, job) to pass to submit_upload().
+    Uploads are decoded straight to a recognition-sized thumbnail (PIL draft()
+    / reduce()), so a full resolution photo never materialises in memory.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    entry = upload_store.lookup(digest)
+    if entry is not None:
+        return entry, None
+    with stage_seconds.time('photo_decode'):
+        thumbnail = decode_thumbnail(io.BytesIO(data))
+        phash = dhash(thumbnail)
+    entry = upload_store.lookup(digest, phash)
+    if entry is not None:
+        return entry, None
+    submitted = time.perf_counter()
+    
+    def on_recognized(usn, score):
+        # Time in the job queue counts: it is part of what the user waits for
+        stage_seconds.observe('recognition', time.perf_counter() - submitted)
+        upload_store.record(digest, usn, score)
+    
+    return None, (digest, phash, image_to_payload(thumbnail), on_recognized)
+
+def submit_upload(data, job):
+    """Queue recognition of an inspected upload; returns the job id, or None if the queue is full.
+    
+    The upload is stored now rather than when the job finishes, so its bytes
+    are not held in memory for the job's lifetime.
+    """
+    digest, phash, payload, on_recognized = job
+    upload_store.store(digest, phash, data)
+    job_id = recognition_jobs.submit(payload, on_recognized)
+    responses_total.inc('job' if job_id else 'busy')
+    if job_id is None:
+        upload_store.discard(digest)
+    return job_id
+
+def recognize_upload(data):
+    """Answer from the upload store when this photo was seen before, else queue recognition"""
+    entry, job = inspect_upload(data)
+    if entry is None:
+        return submit_recognition_job(data, job)
+    reply, reply_type = recognition_reply(entry['usn'])
+    responses_total.inc(reply_type)
+    return jsonify({
+        'reply': reply,
+        'type': reply_type,
+        'alternatives': [],
+        'timestamp': datetime.now().strftime('%H:%M')
+    })
+
+def unreadable_upload_response(error, upload):
+    log.info('unreadable_upload', extra={'error': str(error), 'size': len(upload)})
+    responses_total.inc('error')
+    return jsonify({'reply': '❌ Could not read that photo. Please upload a JPEG or PNG image.',
+                    'type': 'error'}), 400
+
+def recognition_busy():
+    """The recognition job queue is full"""
+    return too_many_requests('recognition_queue', '⏳ Photo recognition is busy right now. Please try again in a few seconds.',
+                             RECOGNITION_RETRY_AFTER)
+
+def open_job_stream():
+    """Take one of the JOB_STREAMS slots for a photo event stream, or raise 429"""
+    if not job_streams.acquire():
+        raise too_many_requests('job_streams', '⏳ Photo recognition is busy right now. Please try again in a few seconds.',
+                                RECOGNITION_RETRY_AFTER)
+
+def job_event_stream(events):
+    """event_stream() holding a job_streams slot until the response is closed"""
+    response = event_stream(events)
+    response.call_on_close(job_streams.release)
+    return response
+
+@app.errorhandler(429)
+def too_many_requests_response(error):
+    response = jsonify({'reply': error.description, 'type': 'error'})
+    response.status_code = 429
+    if getattr(error, 'retry_after', None):
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+@app.errorhandler(413)
+def payload_too_large(error):
+    return jsonify({
+        'reply': f'❌ That upload is too large. Photos must be under {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.',
+        'type': 'error'
+    }), 413
+
+@app.errorhandler(400)
+def bad_request(error):
+    # e.g. a body request.get_json() cannot parse
+    return jsonify({'reply': '❌ Could not read that request. Please try again.', 'type': 'error'}), 400
+
+@app.errorhandler(415)
+def unsupported_media_type(error):
+    return jsonify({
+        'reply': '❌ Unsupported request format. Send a JSON message or a JPEG/PNG photo.',
+        'type': 'error'
+    }), 415
+
+def submit_recognition_job(data, job):
+    job_id = submit_upload(data, job)
+    if job_id is None:
+        raise recognition_busy()
+    return jsonify({
+        'type': 'job',
+        'job_id': job_id,
+        'status': 'pending',
+        'reply': '🔍 Recognizing student photo...',
+        'poll_url': f'/api/jobs/{job_id}',
+        'events_url': f'/api/jobs/{job_id}/events'
+    }), 202
+
+def job_payload(job):
+    payload = {'job_id': job['id'], 'status': job['status']}
+    if job['result'] is not None:
+        payload['reply'], payload['type'] = job['result']
+        payload['timestamp'] = datetime.fromtimestamp(job['finished']).strftime('%H:%M')
+    return payload
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Poll a photo recognition job"""
+    job = recognition_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job_payload(job))
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream a photo recognition job's result as Server-Sent Events"""
+    if recognition_jobs.get(job_id) is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    open_job_stream()
+    
+    def stream():
+        yield sse_event('status', {'job_id': job_id, 'status': 'pending'})
+        job = yield from follow_job(job_id)
+        if job is None:
+            yield sse_event('timeout', {'job_id': job_id})
+        else:
+            yield sse_event('result', job_payload(job))
+    
+    return job_event_stream(stream())
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def event_stream(events):
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def follow_job(job_id):
+    """Yield keep-alive comments while a job runs; returns the finished job, or None on timeout"""
+    deadline = time.monotonic() + JOB_EVENTS_TIMEOUT
+    while time.monotonic() < deadline:
+        job = recognition_jobs.wait(job_id, SSE_HEARTBEAT_SECONDS)
+        if job is None:
+            return None
+        if job['status'] != 'pending':
+            return job
+        # Comment line keeps proxies from closing an idle stream
+        yield ": keep-alive\n\n"
+    return None
+
+def reply_chunks(reply, reply_type):
+    """Split a reply into line-aligned chunks; HTML cards are sent whole"""
+    if reply_type == 'student_record' or len(reply) <= STREAM_CHUNK_CHARS:
+        return [reply]
+    chunks, current = [], ''
+    for line in reply.splitlines(keepends=True):
+        if current and len(current) + len(line) > STREAM_CHUNK_CHARS:
+            chunks.append(current)
+            current = ''
+        current += line
+    return chunks + [current] if current else chunks
+
+def stream_reply(reply, reply_type, alternatives=None):
+    """SSE events for one reply: 'meta' (type), 'chunk's of text, then 'done'"""
+    yield sse_event('meta', {'type': reply_type, 'timestamp': datetime.now().strftime('%H:%M')})
+    for chunk in reply_chunks(reply, reply_type):
+        yield sse_event('chunk', {'text': chunk})
+    # Alternatives need a second retrieval pass, so they go out after the answer
+    yield sse_event('done', {'alternatives': alternatives() if alternatives else []})
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream_endpoint():
+    """Streaming /api/chat: accepts the same requests and answers as Server-Sent Events.
+    
+    Text replies send their type first and then the answer in chunks. Photos
+    get a 'processing' event straight away and the result once recognized.
+    Errors found before streaming starts are plain JSON, as on /api/chat.
+    """
+    try:
+        user_message, upload = read_chat_request()
+        log.info('chat_stream_request', extra={'text': user_message, 'has_image': bool(upload)})
+        
+        if upload:
+            try:
+                entry, job = inspect_upload(upload)
+            except (OSError, ValueError, Image.DecompressionBombError) as e:
+                return unreadable_upload_response(e, upload)
+            if entry is not None:
+                reply, reply_type = recognition_reply(entry['usn'])
+                responses_total.inc(reply_type)
+                return event_stream(stream_reply(reply, reply_type))
+            open_job_stream()
+            job_id = None
+            try:
+                job_id = submit_upload(upload, job)
+            finally:
+                if job_id is None:
+                    job_streams.release()
+            if job_id is None:
+                raise recognition_busy()
+            
+            def recognition_stream():
+                yield sse_event('processing', {'job_id': job_id, 'reply': '🔍 Recognizing student photo...'})
+                finished = yield from follow_job(job_id)
+                if finished is None:
+                    yield from stream_reply('❌ Photo recognition timed out. Please try again.', 'error')
+                else:
+                    yield from stream_reply(*finished['result'])
+            
+            return job_event_stream(recognition_stream())
+        
+        engine = kb_manager.engine
+        response, response_type = engine.generate_response(user_message)
+        responses_total.inc(response_type)
+        record_query(engine, user_message, response, response_type)
+        alternatives = None
+        if wants_alternatives(response_type):
+            alternatives = lambda: engine.did_you_mean(user_message, response)
+        return event_stream(stream_reply(response, response_type, alternatives))
+    except HTTPException:
+        raise
+    except Exception:
+        log.exception('chat_error')
+        responses_total.inc('error')
+        return jsonify({'reply': 'Sorry, I encountered an error. Please try again.', 'type': 'error'})
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch_endpoint():
+    """Answer a list of text messages in one round trip"""
+    data = request.get_json(silent=True) or {}
+    messages = data.get('messages')
+    if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+        return jsonify({'error': "'messages' must be a list of strings"}), 400
+    if len(messages) > BATCH_MAX_MESSAGES:
+        return jsonify({'error': f"At most {BATCH_MAX_MESSAGES} messages per batch"}), 413
+    # Each message spends a token from the client's batch bucket
+    admit_batch(len(messages))
+    
+    with request_seconds.time('chat_batch'):
+        results = kb_manager.engine.generate_responses([m.strip() for m in messages])
+    for _, reply_type in results:
+        responses_total.inc(reply_type)
+    return jsonify({
+        'results': [{'reply': reply, 'type': reply_type} for reply, reply_type in results],
+        'timestamp': datetime.now().strftime('%H:%M')
+    })
+
+@app.route('/api/student/<usn>/card', methods=['GET'])
+def student_card_endpoint(usn):
+    """Serve a pre-rendered student record card with ETag revalidation"""
+    card, etag = student_recognition.student_card(usn)
+    if card is None:
+        return jsonify({'error': f"No student record found for USN {usn.upper()}"}), 404
+    
+    response = make_response(card)
+    response.mimetype = 'text/html'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
 @app.route('/api/suggestions', methods=['GET'])
 def get_suggestions():
-    """Get suggested questions"""
-    suggestions = [
-        "What is the admission process for BE?",
-        "Tell me about fee structure",
-        "Which companies visit for placements?",
-        "What facilities are available?",
-        "How is Computer Science department?",
-        "Is there scholarship available?"
-    ]
+    """Get suggested questions: the most asked knowledge base topics, topped up with defaults"""
+    preprocess = kb_manager.engine.preprocess_text
+    suggestions, seen = [], set()
+    live = [topic for topic, _ in query_analytics.frequent(SUGGESTIONS_COUNT, SUGGESTION_MIN_COUNT)]
+    for text in live + DEFAULT_SUGGESTIONS:
+        key = preprocess(text)
+        if key not in seen and len(suggestions) < SUGGESTIONS_COUNT:
+            seen.add(key)
+            suggestions.append(text[:1].upper() + text[1:])
     return jsonify({'suggestions': suggestions})
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of stage latencies and reply counters"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/cache', methods=['GET'])
+def get_cache_stats():
+    """Get response cache and photo upload store hit/miss counters, and admission control state"""
+    return jsonify(dict(response_cache.stats(), uploads=upload_store.stats(), admission={
+        'photo_slots': photo_slots.stats(),
+        'job_streams': job_streams.stats(),
+        'rate_limited_clients': {'text': text_rate_limiter.clients(), 'photo': photo_rate_limiter.clients(),
+                                 'batch': batch_rate_limiter.clients()}
+    }))
+
 @app.route('/api/knowledge', methods=['GET'])
 def get_knowledge_stats():
     """Get knowledge base statistics"""
+    KB = kb_manager.kb
     stats = {
         'qa_pairs': len(KB.get('qa_pairs', [])),
         'admissions': len(KB.get('admissions', [])),
@@ -525,12 +1189,65 @@ def get_knowledge_stats():
         'fee_structure': len(KB.get('fee_structure', [])),
         'placements': len(KB.get('placements', [])),
         'facilities': len(KB.get('facilities', [])),
-        'departments': len(KB.get('departments', []))
+        'departments': len(KB.get('departments', [])),
+        'version': kb_manager.version
     }
     return jsonify(stats)
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: knowledge base, TF-IDF model and indexes are loaded and warmed up"""
+    engine = kb_manager.engine
+    model_loaded = engine.retriever is not None or not engine.questions
+    ready = ready_since is not None and model_loaded
+    return jsonify({
+        'ready': ready,
+        'kb_version': kb_manager.version,
+        'model_loaded': model_loaded,
+        'indexed_questions': len(engine.questions),
+        'enrolled_photos': len(face_index),
+        'warmed_up_at': ready_since,
+        'pid': os.getpid()
+    }), 200 if ready else 503
+
+def is_admin_request():
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+@app.route('/api/admin/reload', methods=['GET', 'POST'])
+def reload_knowledge():
+    """Rebuild the chatbot from knowledge.json in the background"""
+    if not is_admin_request():
+        return jsonify({'error': 'Admin token required'}), 403
+    if request.method == 'GET':
+        return jsonify(kb_manager.status())
+    started = kb_manager.reload_async(force=request.args.get('force') == '1')
+    return jsonify(dict(kb_manager.status(), started=started)), 202
+
+@app.route('/api/admin/unanswered', methods=['GET'])
+def unanswered_queries():
+    """Export the most frequent questions that got a fallback reply (?limit=N, ?format=csv)"""
+    if not is_admin_request():
+        return jsonify({'error': 'Admin token required'}), 403
+    report = query_analytics.unanswered_report(request.args.get('limit', 50, type=int))
+    if request.args.get('format') != 'csv':
+        return jsonify(report)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['query', 'normalized', 'count', 'error'])
+    for row in report['queries']:
+        writer.writerow([row['query'], row['normalized'], row['count'], row['error']])
+    return Response(out.getvalue(), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=unanswered_queries.csv'})
+
 if __name__ == '__main__':
     print("🚀 BIET Chatbot Server Starting...")
+    KB = kb_manager.kb
     print("📚 Knowledge base loaded successfully!")
     print(f"   - QA Pairs: {len(KB.get('qa_pairs', []))}")
     print(f"   - Admissions info: {len(KB.get('admissions', []))}")
@@ -538,5 +1255,12 @@ if __name__ == '__main__':
     print(f"   - Fee structure: {len(KB.get('fee_structure', []))}")
     print(f"   - Placements: {len(KB.get('placements', []))}")
     print("🎓 Student database initialized!")
+    print(f"   - Students: {student_store.count()}")
+    print(f"   - Enrolled photos: {len(face_index)}")
     print("🌐 Server running on http://localhost:5000")
+    print("   (development server; for production run: gunicorn -c gunicorn.conf.py 'wsgi:create_app()')")
+    # With the debug reloader, only the serving child process watches the file
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        kb_manager.start_watcher(KB_WATCH_INTERVAL)
+        warm_up()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""Stored benchmark baselines and the regression check.
+
+Baselines live in benchmarks/baselines.json as {suite: {metric: value}}.
+Metric names end in their unit; '_per_s' metrics regress when they drop,
+every other metric (latency, build time, RSS) when it grows.  Tail (p95)
+latencies are noisier and get twice the tolerance.  Numbers are
+machine-specific: re-record them with --save-baseline on the machine that
+runs --check.
+"""
+import json, os, platform
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+DEFAULT_TOLERANCE = 0.25
+
+
+def load(path=BASELINES_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save(suite, metrics, path=BASELINES_PATH):
+    baselines = load(path)
+    baselines[suite] = dict(sorted(metrics.items()))
+    baselines.setdefault('_machine', {})[suite] = f"{platform.node()} {platform.machine()} py{platform.python_version()}"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(suite, metrics, tolerance=DEFAULT_TOLERANCE, path=BASELINES_PATH):
+    """Return a list of human-readable regressions against the stored baseline"""
+    baseline = load(path).get(suite)
+    if baseline is None:
+        return [f"no '{suite}' baseline in {path}; record one with --save-baseline"]
+    regressions = []
+    for name, expected in baseline.items():
+        current = metrics.get(name)
+        if current is None or not expected:
+            continue
+        allowed = tolerance * 2 if 'p95' in name else tolerance
+        if name.endswith('_per_s'):
+            if current < expected * (1 - allowed):
+                regressions.append(f"{name}: {current:.4g} < {expected:.4g} (-{1 - current / expected:.0%})")
+        elif current > expected * (1 + allowed):
+            regressions.append(f"{name}: {current:.4g} > {expected:.4g} (+{current / expected - 1:.0%})")
+    return regressions
+
+
+def add_arguments(parser):
+    parser.add_argument('--save-baseline', action='store_true', help='record these results as the baseline')
+    parser.add_argument('--check', action='store_true', help='exit non-zero if results regress past the baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed relative slowdown before --check fails (default: %(default)s)')
+
+
+def finish(suite, metrics, args):
+    """Apply --save-baseline / --check; returns the process exit code"""
+    if args.save_baseline:
+        save(suite, metrics)
+        print(f"Saved '{suite}' baseline to {BASELINES_PATH}")
+    if args.check:
+        regressions = compare(suite, metrics, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against the '{suite}' baseline (tolerance {args.tolerance:.0%})")
+    return 0
@@ -0,0 +1,226 @@
+"""End-to-end latency of the chat API under a mixed workload.
+
+Replays suggestion chips, paraphrased questions (benchmarks/labelled_queries.json),
+bare category keywords and photo uploads against the Flask app, both
+in-process through the test client and over a local socket through a
+threaded Werkzeug server.  Photo requests are timed until the recognition
+result arrives.  The response cache and the upload store are disabled, so
+every request runs retrieval or recognition instead of a cache lookup.
+Reports p50/p95/p99 per request kind, throughput and peak RSS.  Run from
+the repository root:
+
+    python benchmarks/bench_app.py [--requests 2000] [--concurrency 4] [--check]
+"""
+import argparse, http.client, io, json, logging, os, random, resource, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+import baseline
+
+KIND_WEIGHTS = {'chip': 0.3, 'paraphrase': 0.3, 'keyword': 0.3, 'photo': 0.1}
+PHOTO_SIZE = 640
+PHOTO_QUALITIES = (95, 85, 75)
+
+
+def photo_uploads(photo_dir):
+    """Enrolled photos re-encoded the way the web client sends them"""
+    from PIL import Image, ImageOps
+
+    uploads = []
+    for filename in sorted(os.listdir(photo_dir)):
+        try:
+            with Image.open(os.path.join(photo_dir, filename)) as image:
+                image = ImageOps.exif_transpose(image).convert('RGB')
+                image.thumbnail((PHOTO_SIZE, PHOTO_SIZE))
+                for quality in PHOTO_QUALITIES:
+                    buffer = io.BytesIO()
+                    image.save(buffer, 'JPEG', quality=quality)
+                    uploads.append(buffer.getvalue())
+        except OSError:
+            continue
+    return uploads
+
+
+def build_workload(app_module, n_requests, seed):
+    client = app_module.app.test_client()
+    chips = client.get('/api/suggestions').get_json()['suggestions']
+    with open(os.path.join(ROOT, 'labelled_queries.json'), 'r', encoding='utf-8') as f:
+        paraphrases = [item['query'] for item in json.load(f)]
+    keywords = [keyword for intent in app_module.INTENTS for keyword in intent['keywords']]
+    photos = photo_uploads(app_module.STUDENT_PHOTO_DIR)
+
+    pools = {'chip': chips, 'paraphrase': paraphrases, 'keyword': keywords, 'photo': photos}
+    kinds = [kind for kind in KIND_WEIGHTS if pools[kind]]
+    rng = random.Random(seed)
+    chosen = rng.choices(kinds, weights=[KIND_WEIGHTS[kind] for kind in kinds], k=n_requests)
+    return [(kind, rng.choice(pools[kind])) for kind in chosen]
+
+
+class InProcessTransport:
+    name = 'inprocess'
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client
+
+    def send(self, kind, payload):
+        client = self._client()
+        if kind == 'photo':
+            response = client.post('/api/chat', data=payload, content_type='image/jpeg')
+        else:
+            response = client.post('/api/chat', json={'message': payload})
+        data = response.get_json()
+        if response.status_code == 202:
+            # Closing the stream frees its job_streams slot, as a browser disconnecting would
+            with client.get(data['events_url']) as events:
+                events.get_data()
+        elif response.status_code >= 400:
+            raise RuntimeError(f"{kind} request failed with HTTP {response.status_code}")
+
+    def close(self):
+        pass
+
+
+class SocketTransport:
+    name = 'socket'
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def _request(self, method, path, body=None, content_type=None):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        try:
+            conn.request(method, path, body=body, headers={'Content-Type': content_type} if content_type else {})
+            response = conn.getresponse()
+            return response.status, response.read()
+        finally:
+            conn.close()
+
+    def send(self, kind, payload):
+        if kind == 'photo':
+            status, body = self._request('POST', '/api/chat', payload, 'image/jpeg')
+        else:
+            status, body = self._request('POST', '/api/chat', json.dumps({'message': payload}), 'application/json')
+        if status == 202:
+            self._request('GET', urlsplit(json.loads(body)['events_url']).path)
+        elif status >= 400:
+            raise RuntimeError(f"{kind} request failed with HTTP {status}")
+
+    def close(self):
+        self.server.shutdown()
+
+
+def replay(transport, workload, concurrency):
+    """Send every request; returns ({kind: [seconds]}, wall_seconds)"""
+    def timed(item):
+        kind, payload = item
+        start = time.perf_counter()
+        transport.send(kind, payload)
+        return kind, time.perf_counter() - start
+
+    samples = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for kind, seconds in pool.map(timed, workload):
+            samples.setdefault(kind, []).append(seconds)
+    return samples, time.perf_counter() - start
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def summarize(transport_name, runs):
+    """Per-kind percentiles and throughput, each the median over repeated runs"""
+    metrics = {}
+    for samples, wall_seconds in runs:
+        everything = [s for kind_samples in samples.values() for s in kind_samples]
+        for kind, kind_samples in list(samples.items()) + [('all', everything)]:
+            for q in (50, 95, 99):
+                value = float(np.percentile(kind_samples, q)) * 1000
+                metrics.setdefault(f"{transport_name}.{kind}.p{q}_ms", []).append(value)
+        metrics.setdefault(f"{transport_name}.throughput_per_s", []).append(len(everything) / wall_seconds)
+    return {name: float(np.median(values)) for name, values in metrics.items()}
+
+
+def report(transport_name, kinds, metrics):
+    print(f"\n{transport_name}")
+    print(f"{'kind':>12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for kind in sorted(kinds) + ['all']:
+        p50, p95, p99 = (metrics[f"{transport_name}.{kind}.p{q}_ms"] for q in (50, 95, 99))
+        print(f"{kind:>12} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f}")
+    print(f"{'throughput':>12} {metrics[f'{transport_name}.throughput_per_s']:.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--transport', choices=['inprocess', 'socket', 'both'], default='both')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per transport; medians are reported')
+    parser.add_argument('--seed', type=int, default=1)
+    baseline.add_arguments(parser)
+    args = parser.parse_args()
+
+    # Quiet logs and a throwaway upload store, so runs start from the same state
+    os.environ.setdefault('BIET_LOG_LEVEL', 'WARNING')
+    os.environ['BIET_UPLOAD_DIR'] = tempfile.mkdtemp(prefix='biet-bench-uploads-')
+    # The workload repeats a small pool of messages and photos: with caching on,
+    # it would mostly time cache hits instead of retrieval and recognition
+    os.environ['BIET_RESPONSE_CACHE_SIZE'] = os.environ['BIET_UPLOAD_STORE_MB'] = '0'
+    # Every request comes from one address; per-client rate limits would turn most away
+    os.environ['BIET_TEXT_RATE_LIMIT'] = os.environ['BIET_PHOTO_RATE_LIMIT'] = '0'
+    import app as app_module
+
+    workload = build_workload(app_module, args.requests, args.seed)
+    warmup = {kind: payload for kind, payload in workload}
+    transports = {'inprocess': [InProcessTransport], 'socket': [SocketTransport],
+                  'both': [InProcessTransport, SocketTransport]}[args.transport]
+
+    metrics = {}
+    try:
+        for transport_class in transports:
+            transport = transport_class(app_module.app)
+            try:
+                # Spawns the recognition pool and maps every index before timing
+                for kind, payload in warmup.items():
+                    transport.send(kind, payload)
+                runs = [replay(transport, workload, args.concurrency) for _ in range(args.repeat)]
+            finally:
+                transport.close()
+            transport_metrics = summarize(transport.name, runs)
+            report(transport.name, {kind for kind, _ in workload}, transport_metrics)
+            # p99 is printed but too noisy to gate on
+            metrics.update((name, round(value, 3)) for name, value in transport_metrics.items()
+                           if not name.endswith('p99_ms'))
+    finally:
+        app_module.recognition_jobs.shutdown()
+
+    # Both should stay at 0: see the environment set above
+    print(f"\ncache hit rates: responses {app_module.response_cache.stats()['hit_rate']}, "
+          f"uploads {app_module.upload_store.stats()['hit_rate']}")
+    metrics['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    print(f"\npeak RSS {metrics['peak_rss_mb']:.1f} MB (server and client share this process)")
+    sys.exit(baseline.finish('app', metrics, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Retrieval latency against corpus size.
+
+Compares the original dense scoring (one similarity per stored question plus
+a full argmax) with the inverted-index top-k retriever on synthetic
+knowledge bases.  Run from the repository root:
+
+    python benchmarks/bench_retrieval.py --sizes 1000 10000 100000
+"""
+import argparse, os, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tfidf_model import fit_model
+from retrieval import InvertedIndexRetriever
+from synthetic_kb import make_knowledge_base, make_queries
+
+
+def percentile_us(samples, q):
+    return float(np.percentile(samples, q)) * 1e6
+
+
+def time_queries(fn, query_vectors, repeat):
+    samples = []
+    for _ in range(repeat):
+        for query_vector in query_vectors:
+            start = time.perf_counter()
+            fn(query_vector)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('-k', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'corpus':>8} {'fit s':>7} {'dense p50':>10} {'dense p95':>10} {'index p50':>10} {'index p95':>10} {'speedup':>8}")
+    for size in args.sizes:
+        kb = make_knowledge_base(size)
+        start = time.perf_counter()
+        model = fit_model(kb)
+        fit_seconds = time.perf_counter() - start
+
+        retriever = InvertedIndexRetriever(model.tfidf_matrix, model.postings)
+        query_vectors = [model.vectorizer.transform([q]) for q in make_queries(kb, args.queries)]
+
+        def dense(query_vector):
+            similarities = (model.tfidf_matrix @ query_vector.T).toarray().ravel()
+            best = int(np.argmax(similarities))
+            return best, similarities[best]
+
+        def indexed(query_vector):
+            return retriever.search(query_vector, k=args.k)
+
+        # Same winner (up to ties) before timing anything
+        for query_vector in query_vectors[:20]:
+            hits = indexed(query_vector)
+            best, score = dense(query_vector)
+            assert not hits or abs(hits[0][1] - score) < 1e-9, 'retriever disagrees with dense scoring'
+
+        dense_samples = time_queries(dense, query_vectors, args.repeat)
+        index_samples = time_queries(indexed, query_vectors, args.repeat)
+        print(f"{size:>8} {fit_seconds:>7.2f} "
+              f"{percentile_us(dense_samples, 50):>8.0f}us {percentile_us(dense_samples, 95):>8.0f}us "
+              f"{percentile_us(index_samples, 50):>8.0f}us {percentile_us(index_samples, 95):>8.0f}us "
+              f"{np.median(dense_samples) / np.median(index_samples):>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""How ChatbotEngine start-up and answer lookup scale with knowledge base size.
+
+For each synthetic knowledge base (benchmarks/synthetic_kb.py) this times
+setup_nlp cold (fit, persist and map the TF-IDF/LSA artifact; the first
+size also pays for importing scikit-learn) and warm (map the artifact the
+cold run wrote, best of --repeat), then the latency of find_best_match
+over paraphrased queries.  Run from the repository root:
+
+    python benchmarks/bench_scaling.py [--sizes 10 1000 10000 100000] [--check]
+"""
+import argparse, os, shutil, sys, tempfile, time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+import baseline
+from synthetic_kb import make_knowledge_base, make_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3, help='warm start-ups per size; the fastest is kept')
+    baseline.add_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ.setdefault('BIET_LOG_LEVEL', 'WARNING')
+    import app as app_module
+
+    cache_dir = tempfile.mkdtemp(prefix='biet-bench-models-')
+    app_module.MODEL_CACHE_DIR = cache_dir
+    metrics = {}
+    print(f"{'qa pairs':>9} {'cold s':>8} {'warm ms':>8} {'p50 us':>8} {'p95 us':>8} {'p99 us':>8}")
+    try:
+        for size in args.sizes:
+            kb = make_knowledge_base(size)
+            start = time.perf_counter()
+            app_module.ChatbotEngine(kb)
+            cold = time.perf_counter() - start
+            warm = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                engine = app_module.ChatbotEngine(kb)
+                warm = min(warm, time.perf_counter() - start)
+
+            samples = []
+            for query in make_queries(kb, args.queries):
+                start = time.perf_counter()
+                engine.find_best_match(query)
+                samples.append(time.perf_counter() - start)
+            p50, p95, p99 = (float(np.percentile(samples, q)) * 1e6 for q in (50, 95, 99))
+            print(f"{size:>9} {cold:>8.2f} {warm * 1000:>8.1f} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f}")
+            metrics[f"{size}.setup_cold_s"] = round(cold, 3)
+            metrics[f"{size}.setup_warm_ms"] = round(warm * 1000, 2)
+            metrics[f"{size}.find_best_match_p50_us"] = round(p50, 1)
+            metrics[f"{size}.find_best_match_p95_us"] = round(p95, 1)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    sys.exit(baseline.finish('scaling', metrics, args))
+
+
+if __name__ == '__main__':
+    main()
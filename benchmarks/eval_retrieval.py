@@ -0,0 +1,79 @@
+"""Offline evaluation of answer retrieval on a labelled query set.
+
+Reports hit@1, hit@3, the share of queries answered above the chat
+threshold and per-query latency, for lexical-only and hybrid (lexical +
+LSA) retrieval.  A query is a hit when the expected text appears in the
+retrieved answer.  Run from the repository root:
+
+    python benchmarks/eval_retrieval.py [--queries benchmarks/labelled_queries.json]
+"""
+import argparse, json, os, re, sys, time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tfidf_model import load_or_build
+from retrieval import InvertedIndexRetriever, HybridRetriever
+
+ANSWER_THRESHOLD = 0.3
+
+
+def evaluate(model, retriever, labelled, preprocess):
+    hits_at_1 = hits_at_3 = answered = 0
+    latencies = []
+    for item in labelled:
+        start = time.perf_counter()
+        query_vector = model.vectorizer.transform([preprocess(item['query'])])
+        results = retriever.search(query_vector, k=3)
+        latencies.append(time.perf_counter() - start)
+
+        answers = [model.answers[idx] for idx, _ in results]
+        if results and results[0][1] > ANSWER_THRESHOLD:
+            answered += 1
+        if answers and item['expected'] in answers[0]:
+            hits_at_1 += 1
+        if any(item['expected'] in answer for answer in answers):
+            hits_at_3 += 1
+    n = len(labelled)
+    return {
+        'hit@1': hits_at_1 / n,
+        'hit@3': hits_at_3 / n,
+        'answered': answered / n,
+        'p50_us': float(np.percentile(latencies, 50)) * 1e6,
+        'p95_us': float(np.percentile(latencies, 95)) * 1e6
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--knowledge', default=os.path.join(ROOT, 'knowledge.json'))
+    parser.add_argument('--queries', default=os.path.join(ROOT, 'benchmarks', 'labelled_queries.json'))
+    parser.add_argument('--cache-dir', default=os.path.join(ROOT, 'model_cache'))
+    parser.add_argument('--lexical-weight', type=float, nargs='+', default=[0.6])
+    args = parser.parse_args()
+
+    with open(args.knowledge, 'r', encoding='utf-8') as f:
+        kb = json.load(f)
+    with open(args.queries, 'r', encoding='utf-8') as f:
+        labelled = json.load(f)
+
+    # Same normalisation as ChatbotEngine.preprocess_text
+    preprocess = lambda text: re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', '', text.lower().strip()))
+
+    model = load_or_build(kb, args.cache_dir)
+    lexical = InvertedIndexRetriever(model.tfidf_matrix, model.postings)
+    configs = [('lexical', lexical)]
+    for weight in args.lexical_weight:
+        configs.append((f"hybrid w={weight}", HybridRetriever(lexical, model.lsa, lexical_weight=weight)))
+
+    print(f"{len(labelled)} labelled queries, {len(model.questions)} indexed questions")
+    print(f"{'retriever':>14} {'hit@1':>6} {'hit@3':>6} {'answered':>9} {'p50':>8} {'p95':>8}")
+    for name, retriever in configs:
+        r = evaluate(model, retriever, labelled, preprocess)
+        print(f"{name:>14} {r['hit@1']:>6.2f} {r['hit@3']:>6.2f} {r['answered']:>9.2f} "
+              f"{r['p50_us']:>6.0f}us {r['p95_us']:>6.0f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Regression check for query typo correction.
+
+Each case in benchmarks/spelling_cases.json gives a query, the text the
+spelling corrector must turn it into, and optionally the intent the
+corrected text must (or must not) route to.  Misspellings have to be fixed
+and ordinary English has to be left alone.  Also reports the correction
+latency.  Exits non-zero on any failure.  Run from the repository root:
+
+    python benchmarks/eval_spelling.py [--cases benchmarks/spelling_cases.json]
+"""
+import argparse, json, os, sys, time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tfidf_model import load_or_build
+from intent_router import IntentRouter
+from spelling import SpellingCorrector
+from student_store import StudentStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--knowledge', default=os.path.join(ROOT, 'knowledge.json'))
+    parser.add_argument('--cases', default=os.path.join(ROOT, 'benchmarks', 'spelling_cases.json'))
+    parser.add_argument('--cache-dir', default=os.path.join(ROOT, 'model_cache'))
+    parser.add_argument('--students', default=os.path.join(ROOT, 'students.db'), help='student names are never corrected')
+    args = parser.parse_args()
+
+    with open(args.knowledge, 'r', encoding='utf-8') as f:
+        kb = json.load(f)
+    with open(args.cases, 'r', encoding='utf-8') as f:
+        cases = json.load(f)
+
+    router = IntentRouter()
+    model = load_or_build(kb, args.cache_dir)
+    students = StudentStore(args.students)
+    speller = SpellingCorrector.for_vocabulary(
+        model.vectorizer, router.keywords,
+        names=lambda: [student['name'] for student in students.directory()]).build()
+
+    failures, latencies = [], []
+    for case in cases:
+        start = time.perf_counter()
+        corrected = speller.correct(case['query'])
+        latencies.append(time.perf_counter() - start)
+        intents = [intent['name'] for intent in router.match(corrected)]
+        routed = intents[0] if intents else None
+        if corrected != case['corrected']:
+            failures.append(f"{case['query']!r}: corrected to {corrected!r}, expected {case['corrected']!r}")
+        if 'intent' in case and routed != case['intent']:
+            failures.append(f"{case['query']!r}: routed to {routed}, expected {case['intent']}")
+        if 'not_intent' in case and case['not_intent'] in intents:
+            failures.append(f"{case['query']!r}: must not route to {case['not_intent']}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print(f"{len(cases) - len({f.split(':')[0] for f in failures})}/{len(cases)} cases pass; "
+          f"correction p50 {float(np.percentile(latencies, 50)) * 1e6:.0f}us "
+          f"p95 {float(np.percentile(latencies, 95)) * 1e6:.0f}us (uncached)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import random
+
+TOPIC_WORDS = [
+    'admission', 'eligibility', 'counseling', 'fee', 'scholarship', 'hostel', 'library', 'placement',
+    'recruiter', 'package', 'internship', 'semester', 'exam', 'syllabus', 'circular', 'vtu', 'result',
+    'revaluation', 'attendance', 'department', 'laboratory', 'project', 'seminar', 'workshop', 'sports',
+    'transport', 'canteen', 'medical', 'alumni', 'research', 'faculty', 'timetable', 'backlog', 'grade'
+]
+QUESTION_STEMS = ['what is the', 'how do i get', 'when is the', 'where can i find', 'tell me about the',
+                  'is there any', 'who handles the', 'how much is the']
+
+
+def _pseudo_words(rng, count):
+    consonants, vowels = 'bcdfghjklmnprstvwyz', 'aeiou'
+    words = set()
+    while len(words) < count:
+        length = rng.randint(2, 4)
+        words.add(''.join(rng.choice(consonants) + rng.choice(vowels) for _ in range(length)))
+    return sorted(words)
+
+
+def make_knowledge_base(n_pairs, seed=42, vocabulary_size=None):
+    """Generate a knowledge.json-shaped dict with n_pairs synthetic QA pairs.
+
+    Question words follow a Zipf-like distribution over a vocabulary that
+    grows with the corpus, like real FAQ collections.
+    """
+    rng = random.Random(seed)
+    vocabulary_size = vocabulary_size or max(200, min(20000, n_pairs // 2))
+    vocabulary = TOPIC_WORDS + _pseudo_words(rng, vocabulary_size)
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+
+    qa_pairs = []
+    for idx in range(n_pairs):
+        terms = rng.choices(vocabulary, weights=weights, k=rng.randint(3, 7))
+        qa_pairs.append({
+            'question': f"{rng.choice(QUESTION_STEMS)} {' '.join(terms)}",
+            'answer': f"Answer {idx}: information about {' '.join(terms)}.",
+            'keywords': terms[:3],
+            'category': 'generated'
+        })
+    return {
+        'institute_info': {'name': 'Synthetic Institute'},
+        'qa_pairs': qa_pairs,
+        'greetings': ['Hello!'],
+        'fallback_responses': ["I'm not sure about that."]
+    }
+
+
+def make_queries(kb, n_queries, seed=7):
+    """Sample queries by dropping and shuffling words of stored questions"""
+    rng = random.Random(seed)
+    questions = [qa['question'] for qa in kb['qa_pairs']]
+    queries = []
+    for _ in range(n_queries):
+        words = rng.choice(questions).split()
+        kept = [w for w in words if rng.random() > 0.3] or words[-1:]
+        rng.shuffle(kept)
+        queries.append(' '.join(kept))
+    return queries
@@ -0,0 +1,218 @@
+import base64, hashlib, io, json, os, re
+import numpy as np
+from PIL import Image, ImageOps
+
+from structured_log import get_logger
+
+# Embedding layout: a mean/variance normalised grayscale thumbnail (shape and
+# shading of the face) followed by a coarse RGB histogram (skin, hair and
+# background tones).  Both halves are L2 normalised before concatenation so
+# neither dominates the cosine score.
+THUMBNAIL_SIZE = 24
+COLOR_BINS = 4
+EMBEDDING_DIM = THUMBNAIL_SIZE * THUMBNAIL_SIZE + COLOR_BINS ** 3
+COLOR_WEIGHT = 0.5
+DECODE_SIZE = 96
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+EMBEDDINGS_FILE = 'face_embeddings.npy'
+MANIFEST_FILE = 'face_manifest.json'
+
+log = get_logger('face_index')
+
+
+def decode_image(image_data):
+    """Decode a data URL, base64 string, raw bytes or thumbnail payload into a PIL image"""
+    if isinstance(image_data, Image.Image):
+        return image_data
+    if isinstance(image_data, tuple):
+        mode, size, pixels = image_data
+        return Image.frombytes(mode, size, pixels)
+    if isinstance(image_data, str):
+        if image_data.startswith('data:'):
+            image_data = image_data.split(',', 1)[1]
+        image_data = base64.b64decode(image_data)
+    return Image.open(io.BytesIO(image_data))
+
+
+def decode_thumbnail(fp, size=DECODE_SIZE):
+    """Decode an uploaded image file straight to a small RGB thumbnail.
+
+    JPEGs are decoded with draft() at the smallest DCT scale that still
+    covers `size`, so a 12 MP photo never materialises at full resolution;
+    other formats are shrunk with reduce() right after decoding.
+    """
+    with Image.open(fp) as image:
+        if image.format == 'JPEG':
+            image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        factor = min(image.size) // (2 * size)
+        if factor >= 2:
+            image = image.reduce(factor)
+        return image.convert('RGB')
+
+
+def image_to_payload(image):
+    """Compact picklable form of a decoded thumbnail for worker processes"""
+    return (image.mode, image.size, image.tobytes())
+
+
+def compute_embedding(image):
+    """Compute a unit-length float32 feature vector for a face photo"""
+    if image.format == 'JPEG':
+        # Let the JPEG decoder skip DCT coefficients we would throw away
+        image.draft('RGB', (DECODE_SIZE, DECODE_SIZE))
+    image = ImageOps.exif_transpose(image).convert('RGB')
+
+    # Portrait photos: keep the centred square where the face sits
+    width, height = image.size
+    side = min(width, height)
+    left = (width - side) // 2
+    top = max(0, (height - side) // 4)
+    image = image.crop((left, top, left + side, top + side))
+
+    gray = np.asarray(
+        image.convert('L').resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.BILINEAR),
+        dtype=np.float32
+    ).ravel()
+    gray -= gray.mean()
+    gray /= np.linalg.norm(gray) or 1.0
+
+    pixels = np.asarray(image.resize((32, 32), Image.BILINEAR), dtype=np.uint8).reshape(-1, 3)
+    bins = (pixels.astype(np.int32) * COLOR_BINS) // 256
+    codes = (bins[:, 0] * COLOR_BINS + bins[:, 1]) * COLOR_BINS + bins[:, 2]
+    hist = np.sqrt(np.bincount(codes, minlength=COLOR_BINS ** 3).astype(np.float32))
+    hist /= np.linalg.norm(hist) or 1.0
+
+    embedding = np.concatenate([gray, COLOR_WEIGHT * hist])
+    embedding /= np.linalg.norm(embedding) or 1.0
+    return embedding.astype(np.float32)
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+
+
+def match_photo_to_student(filename, students):
+    """Map an enrolment photo file name to a student's USN.
+
+    Accepts `<usn>.jpg`, `<first>_<last>.jpg` or `<first>.jpg` when the first
+    name is unambiguous.
+    """
+    stem = _slug(os.path.splitext(filename)[0])
+    first_name_matches = []
+    for student in students:
+        usn = student.get('usn', '')
+        if stem == _slug(usn) or stem == _slug(student.get('name', '')):
+            return usn
+        first_name = _slug(student.get('name', '').split(' ')[0]) if student.get('name') else ''
+        if stem == first_name:
+            first_name_matches.append(usn)
+    return first_name_matches[0] if len(first_name_matches) == 1 else None
+
+
+class FaceEmbeddingIndex:
+    """Nearest-neighbour index over enrolled student photos.
+
+    Embeddings are stored as one normalised float32 matrix on disk and
+    memory-mapped, so a query is a single matrix-vector product.
+    """
+
+    def __init__(self, photo_dir, cache_dir, threshold=0.85):
+        self.photo_dir = photo_dir
+        self.cache_dir = cache_dir
+        self.threshold = threshold
+        self.embeddings = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self.usns = []
+        self.files = []
+        # Changes whenever the enrolled photos (or threshold) do
+        self.version = ''
+
+    def _photo_listing(self, students):
+        listing = []
+        if not os.path.isdir(self.photo_dir):
+            return listing
+        for filename in sorted(os.listdir(self.photo_dir)):
+            if not filename.lower().endswith(PHOTO_EXTENSIONS):
+                continue
+            usn = match_photo_to_student(filename, students)
+            if not usn:
+                continue
+            stat = os.stat(os.path.join(self.photo_dir, filename))
+            listing.append({'file': filename, 'usn': usn, 'mtime': stat.st_mtime, 'size': stat.st_size})
+        return listing
+
+    def load_or_build(self, students):
+        """Memory-map the saved index, rebuilding it if the enrolled photos changed"""
+        listing = self._photo_listing(students)
+        manifest_path = os.path.join(self.cache_dir, MANIFEST_FILE)
+        embeddings_path = os.path.join(self.cache_dir, EMBEDDINGS_FILE)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('dim') == EMBEDDING_DIM and manifest.get('photos') == listing:
+                self._load(manifest, embeddings_path)
+                return self
+        except (OSError, ValueError):
+            pass
+        return self.build(listing)
+
+    def load(self):
+        """Memory-map the saved index as-is (e.g. in recognition worker processes)"""
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('dim') == EMBEDDING_DIM:
+                self._load(manifest, os.path.join(self.cache_dir, EMBEDDINGS_FILE))
+        except (OSError, ValueError) as e:
+            log.warning('face_index_unavailable', extra={'error': str(e)})
+        return self
+
+    def build(self, listing):
+        """Embed every enrolled photo and persist the matrix atomically"""
+        rows, kept = [], []
+        for entry in listing:
+            try:
+                with Image.open(os.path.join(self.photo_dir, entry['file'])) as image:
+                    rows.append(compute_embedding(image))
+                kept.append(entry)
+            except Exception as e:
+                log.warning('enrolment_photo_skipped', extra={'file': entry['file'], 'error': str(e)})
+
+        matrix = np.vstack(rows) if rows else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        manifest = {'dim': EMBEDDING_DIM, 'photos': listing, 'rows': kept}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        embeddings_path = os.path.join(self.cache_dir, EMBEDDINGS_FILE)
+        tmp_path = embeddings_path + '.tmp.npy'
+        np.save(tmp_path, matrix)
+        os.replace(tmp_path, embeddings_path)
+        manifest_tmp = os.path.join(self.cache_dir, MANIFEST_FILE + '.tmp')
+        with open(manifest_tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(manifest_tmp, os.path.join(self.cache_dir, MANIFEST_FILE))
+
+        self._load(manifest, embeddings_path)
+        return self
+
+    def _load(self, manifest, embeddings_path):
+        rows = manifest.get('rows', [])
+        self.embeddings = np.load(embeddings_path, mmap_mode='r') if rows else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self.usns = [entry['usn'] for entry in rows]
+        self.files = [entry['file'] for entry in rows]
+        payload = json.dumps([rows, self.threshold], sort_keys=True).encode('utf-8')
+        self.version = hashlib.sha256(payload).hexdigest()[:16]
+
+    def query(self, embedding):
+        """Return (usn, score) of the closest enrolled photo, usn is None below threshold"""
+        if not self.usns:
+            return None, 0.0
+        scores = self.embeddings @ embedding
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < self.threshold:
+            return None, score
+        return self.usns[best], score
+
+    def __len__(self):
+        return len(self.usns)
@@ -0,0 +1,30 @@
+"""Gunicorn settings for the pre-fork production server.
+
+    python static_assets.py    # fingerprinted, precompressed static files
+    gunicorn -c gunicorn.conf.py 'wsgi:create_app()'
+
+Environment:
+    BIET_BIND      address to listen on (default 0.0.0.0:5000)
+    BIET_WORKERS   worker processes (default: one per CPU)
+    BIET_THREADS   request threads per worker (default 8); photo event
+                   streams hold a thread for up to a minute, so keep this
+                   above BIET_JOB_STREAMS (default 4), the most a worker
+                   keeps open before answering 429
+    BIET_TIMEOUT   seconds before a silent worker is restarted (default 60)
+"""
+import multiprocessing, os
+
+bind = os.environ.get('BIET_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('BIET_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('BIET_THREADS', '8'))
+worker_class = 'gthread'
+timeout = int(os.environ.get('BIET_TIMEOUT', '60'))
+keepalive = 5
+
+# Load the app once in the master and share it copy-on-write with workers
+preload_app = True
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.start_worker()
@@ -0,0 +1,94 @@
+import re
+
+# Declarative intent table.  'pre' intents are answered before TF-IDF
+# retrieval, 'post' intents only when retrieval finds nothing confident.
+# Higher priority wins when several intents match the same message.
+# Keywords match whole words only, so list plural forms explicitly.
+INTENTS = [
+    {
+        'name': 'photo_prompt', 'stage': 'pre', 'priority': 100,
+        'keywords': ['student', 'students', 'photo', 'photos', 'picture', 'recognize', 'recognise',
+                     'camera', 'upload']
+    },
+    {
+        'name': 'admissions', 'stage': 'pre', 'priority': 90, 'category': 'admissions',
+        'keywords': ['admission', 'admissions', 'admit', 'admitted', 'apply', 'application', 'applications',
+                     'eligibility', 'eligible', 'cet', 'kcet', 'comedk']
+    },
+    {
+        'name': 'fees', 'stage': 'pre', 'priority': 80, 'category': 'fee_structure',
+        'keywords': ['fee', 'fees', 'cost', 'costs', 'tuition', 'scholarship', 'scholarships', 'payment', 'payments']
+    },
+    {
+        'name': 'placements', 'stage': 'pre', 'priority': 70, 'category': 'placements',
+        'keywords': ['placement', 'placements', 'company', 'companies', 'recruiter', 'recruiters', 'job', 'jobs',
+                     'package', 'packages', 'salary']
+    },
+    {
+        'name': 'courses', 'stage': 'pre', 'priority': 60, 'category': 'courses',
+        'keywords': ['course', 'courses', 'program', 'programs', 'programme', 'programmes', 'b.e', 'm.tech',
+                     'mca', 'mba', 'engineering']
+    },
+    {
+        'name': 'facilities', 'stage': 'pre', 'priority': 50, 'category': 'facilities',
+        'keywords': ['facility', 'facilities', 'hostel', 'hostels', 'library', 'lab', 'labs', 'laboratory',
+                     'laboratories', 'sports', 'cafeteria', 'canteen', 'medical']
+    },
+    {
+        'name': 'departments', 'stage': 'pre', 'priority': 40, 'category': 'departments',
+        'keywords': ['department', 'departments', 'cse', 'computer science', 'mechanical', 'civil', 'electronics',
+                     'electrical', 'chemical', 'biotechnology']
+    },
+    {
+        'name': 'greeting', 'stage': 'post', 'priority': 30,
+        'keywords': ['hi', 'hello', 'hey', 'namaste', 'good morning', 'good afternoon', 'good evening']
+    },
+    {
+        'name': 'thanks', 'stage': 'post', 'priority': 20,
+        'keywords': ['thank', 'thanks', 'thank you', 'thankyou']
+    },
+    {
+        'name': 'help', 'stage': 'post', 'priority': 10,
+        'keywords': ['help', 'what can you do', 'options']
+    },
+    {
+        'name': 'contact', 'stage': 'post', 'priority': 0,
+        'keywords': ['contact', 'phone', 'email', 'address', 'where are you', 'location']
+    }
+]
+
+
+def _normalize_keyword(keyword):
+    return ' '.join(keyword.lower().split())
+
+
+class IntentRouter:
+    """Single-pass keyword router compiled from an intent table.
+
+    All keywords are folded into one word-boundary regex, so routing costs one
+    scan of the message regardless of how many intents or keywords exist.
+    """
+
+    def __init__(self, intents=INTENTS):
+        self.intents = sorted(intents, key=lambda intent: -intent['priority'])
+        self.keyword_intents = {}
+        for intent in self.intents:
+            for keyword in intent['keywords']:
+                self.keyword_intents.setdefault(_normalize_keyword(keyword), []).append(intent)
+
+        # Longest keywords first so 'thank you' wins over 'thank' at the same offset
+        alternatives = sorted(self.keyword_intents, key=len, reverse=True)
+        pattern = '|'.join(r'\s+'.join(re.escape(word) for word in keyword.split()) for keyword in alternatives)
+        self.pattern = re.compile(rf'(?<!\w)(?:{pattern})(?!\w)', re.IGNORECASE)
+
+    @property
+    def keywords(self):
+        return list(self.keyword_intents)
+
+    def match(self, text):
+        """Return every matched intent, highest priority first"""
+        matched = {}
+        for m in self.pattern.finditer(text):
+            for intent in self.keyword_intents.get(_normalize_keyword(m.group(0)), []):
+                matched[intent['name']] = intent
+        return sorted(matched.values(), key=lambda intent: -intent['priority'])
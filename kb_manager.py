@@ -0,0 +1,142 @@
+import json, os, threading, time
+from datetime import datetime
+
+from tfidf_model import kb_content_hash
+from structured_log import get_logger
+
+log = get_logger('kb_manager')
+
+LIST_SECTIONS = ['admissions', 'courses', 'fee_structure', 'placements', 'facilities', 'departments',
+                 'greetings', 'fallback_responses']
+
+
+def validate_knowledge_base(kb):
+    """Raise ValueError if the parsed knowledge.json is not usable"""
+    if not isinstance(kb, dict):
+        raise ValueError("knowledge base must be a JSON object")
+    for section in LIST_SECTIONS:
+        items = kb.get(section, [])
+        if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+            raise ValueError(f"'{section}' must be a list of strings")
+    qa_pairs = kb.get('qa_pairs', [])
+    if not isinstance(qa_pairs, list):
+        raise ValueError("'qa_pairs' must be a list")
+    for idx, qa in enumerate(qa_pairs):
+        if not isinstance(qa, dict) or not isinstance(qa.get('question'), str) or not isinstance(qa.get('answer'), str):
+            raise ValueError(f"qa_pairs[{idx}] needs string 'question' and 'answer' fields")
+    for section in ('greetings', 'fallback_responses'):
+        if not kb.get(section):
+            raise ValueError(f"'{section}' must not be empty")
+
+
+class KnowledgeBaseManager:
+    """Owns the live knowledge base and ChatbotEngine.
+
+    Reloads parse, validate and build a complete new engine off the request
+    path, then publish it with a single reference assignment, so a request
+    always sees either the old engine or the new one and never a partial index.
+    A replacement engine is passed to `warm_up` before it is published, so
+    the first requests after a reload do not pay for its lazy setup.
+    """
+
+    def __init__(self, path, engine_factory, warm_up=None):
+        self.path = path
+        self.engine_factory = engine_factory
+        self.warm_up = warm_up
+        self._state = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._signature = None
+        self.version = 0
+        self.loaded_at = None
+        self.last_error = None
+        self.reloading = False
+
+    @property
+    def kb(self):
+        return self._state[0]
+
+    @property
+    def engine(self):
+        return self._state[1]
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def load(self):
+        """Synchronously load the knowledge base at startup (errors propagate)"""
+        with self._reload_lock:
+            self._build_and_swap(force=True)
+        return self
+
+    def reload(self, force=False):
+        """Rebuild from disk; returns True if a new engine was published"""
+        with self._reload_lock:
+            self.reloading = True
+            try:
+                return self._build_and_swap(force)
+            except Exception as e:
+                self.last_error = f"{datetime.now().isoformat(timespec='seconds')}: {e}"
+                log.error('kb_reload_failed', extra={'error': str(e)})
+                return False
+            finally:
+                self.reloading = False
+
+    def _build_and_swap(self, force):
+        signature = self._file_signature()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            kb = json.load(f)
+        validate_knowledge_base(kb)
+
+        if not force and self._state is not None and kb_content_hash(kb) == self.engine.kb_hash:
+            self._signature = signature
+            return False
+
+        engine = self.engine_factory(kb)
+        if self._state is not None and self.warm_up is not None:
+            self.warm_up(engine)
+        self._state = (kb, engine)
+        self._signature = signature
+        self.version += 1
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+        self.last_error = None
+        log.info('kb_loaded', extra={'version': self.version, 'questions': len(engine.questions)})
+        return True
+
+    def reload_async(self, force=False):
+        """Start a background reload; returns False if one is already running"""
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, kwargs={'force': force}, name='kb-reload', daemon=True).start()
+        return True
+
+    def start_watcher(self, interval=2.0):
+        """Poll knowledge.json and reload in the background when it changes"""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                signature = self._file_signature()
+                if signature != self._signature:
+                    # Remember it even if the reload fails, so a broken file is reported once
+                    self._signature = signature
+                    self.reload()
+
+        self._watcher = threading.Thread(target=watch, name='kb-watcher', daemon=True)
+        self._watcher.start()
+
+    def status(self):
+        return {
+            'version': self.version,
+            'kb_hash': self.engine.kb_hash if self._state else None,
+            'loaded_at': self.loaded_at,
+            'reloading': self.reloading,
+            'last_error': self.last_error,
+            'watching': self._watcher is not None
+        }
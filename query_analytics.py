@@ -0,0 +1,145 @@
+"""Streaming heavy-hitter analytics over chat traffic in fixed memory.
+
+SpaceSaving keeps approximate counts for the most frequent items of an
+unbounded stream (Metwally, Agrawal & El Abbadi, "Efficient Computation of
+Frequent and Top-k Elements in Data Streams").  It never holds more than
+`capacity` items: an unseen item replaces the least frequent tracked one and
+inherits its count, recorded as `error`, the most the new count can be
+overestimated by.  Any item seen more than total / capacity times is
+guaranteed to be tracked.  Items live in buckets by count, so adding is O(1)
+however long the tail of one-off queries gets.
+
+QueryAnalytics counts answered queries by topic (the knowledge base
+question or category they were answered with), once per client, so
+suggestions built from it never echo what a user typed and one client
+repeating a request cannot promote it.
+
+Counts are per process; with several server workers each sees its own share
+of the traffic.
+"""
+import threading
+from collections import OrderedDict
+
+
+class SpaceSaving:
+    """Approximate top-k counts over a stream, tracking at most `capacity` items"""
+
+    def __init__(self, capacity=1024):
+        self.capacity = max(capacity, 1)
+        self.total = 0
+        self._counts = {}
+        self._errors = {}
+        self._labels = {}
+        # count -> items with that count, oldest first (dicts as ordered sets)
+        self._buckets = {}
+        self._min = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def add(self, item, label=None):
+        """Count one occurrence of `item`; `label` (kept per item, latest wins) is returned by top()"""
+        with self._lock:
+            self.total += 1
+            self._labels[item] = label
+            count = self._counts.get(item)
+            if count is not None:
+                self._detach(item, count)
+                self._attach(item, count + 1)
+                return
+            floor = 0
+            if len(self._counts) >= self.capacity:
+                floor = self._min
+                victim = next(iter(self._buckets[floor]))
+                self._detach(victim, floor)
+                del self._counts[victim], self._errors[victim], self._labels[victim]
+            self._errors[item] = floor
+            self._attach(item, floor + 1)
+            if floor == 0:
+                self._min = 1
+
+    def _attach(self, item, count):
+        self._counts[item] = count
+        self._buckets.setdefault(count, {})[item] = None
+
+    def _detach(self, item, count):
+        bucket = self._buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self._buckets[count]
+            if count == self._min:
+                # The item, or the one replacing it, is about to land on count + 1
+                self._min = count + 1
+
+    def top(self, k=None):
+        """[(item, count, error, label)], most frequent first"""
+        with self._lock:
+            ranked = []
+            for count in sorted(self._buckets, reverse=True):
+                for item in self._buckets[count]:
+                    ranked.append((item, count, self._errors[item], self._labels[item]))
+                    if k is not None and len(ranked) >= k:
+                        return ranked
+            return ranked
+
+
+class QueryAnalytics:
+    """Heavy hitters among answered topics, by distinct client, and among queries that got a fallback reply.
+
+    Which clients asked about a topic is remembered for the `capacity` * 16
+    most recent (topic, client) pairs; a client forgotten since its last
+    request about a topic is counted again.
+    """
+
+    def __init__(self, capacity=1024):
+        self.topics = SpaceSaving(capacity)
+        self.unanswered = SpaceSaving(capacity)
+        self.max_askers = capacity * 16
+        self._askers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, key, text, topic=None, client=None, answered=True):
+        """Count `topic` once per client, and the query under its normalized `key` if it got no answer"""
+        if topic is not None and self._first_ask(topic, client):
+            self.topics.add(topic)
+        if key and not answered:
+            self.unanswered.add(key, text)
+
+    def _first_ask(self, topic, client):
+        pair = (topic, client)
+        with self._lock:
+            if pair in self._askers:
+                self._askers.move_to_end(pair)
+                return False
+            self._askers[pair] = None
+            if len(self._askers) > self.max_askers:
+                self._askers.popitem(last=False)
+            return True
+
+    def frequent(self, k, min_count=1):
+        """Up to k (topic, guaranteed number of clients) of the most asked topics.
+
+        `min_count` applies to count - error, the clients the sketch can
+        vouch for, so a topic that merely inherited a high count from an
+        evicted one does not qualify.
+        """
+        frequent = []
+        for topic, count, error, _ in self.topics.top():
+            if count < min_count:
+                break
+            if count - error >= min_count:
+                frequent.append((topic, count - error))
+                if len(frequent) >= k:
+                    break
+        return frequent
+
+    def unanswered_report(self, k=None):
+        """The most frequent queries that fell through to a fallback reply"""
+        return {
+            'total': self.unanswered.total,
+            'tracked': len(self.unanswered),
+            'capacity': self.unanswered.capacity,
+            'queries': [{'query': text, 'normalized': key, 'count': count, 'error': error}
+                        for key, count, error, text in self.unanswered.top(k)]
+        }
@@ -0,0 +1,250 @@
+"""Photo recognition jobs on a bounded process pool.
+
+Decoding and embedding a photo is CPU-bound, so it runs in separate
+processes and never holds a request thread.  Submitting returns a job id
+immediately; results are read by polling or by waiting on the job (used by
+the Server-Sent Events endpoint).
+
+With several server processes, job status is also written to a small
+SQLite table (JobResults) so that a poll or event stream landing on another
+worker still finds the job.
+
+This module is imported by the pool's worker processes, so it must not
+import app.
+"""
+import multiprocessing, os, sqlite3, threading, time, uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from face_index import FaceEmbeddingIndex, compute_embedding, decode_image
+from structured_log import get_logger
+
+log = get_logger('recognition_jobs')
+
+SHARED_POLL_INTERVAL = 0.2
+FAILED_REPLY = ("❌ Could not process the photo. Try another image.", 'error')
+TIMED_OUT_REPLY = ("❌ Photo recognition timed out. Please try again.", 'error')
+
+_worker_index = None
+
+
+def _init_worker(nice, photo_dir, cache_dir, threshold):
+    global _worker_index
+    if nice:
+        # Below the serving process, so recognition never starves text replies
+        os.nice(nice)
+    _worker_index = FaceEmbeddingIndex(photo_dir, cache_dir, threshold=threshold).load()
+
+
+def recognize_in_worker(image_data):
+    """Runs in a pool process: decode, embed and query; returns (usn, score)"""
+    with decode_image(image_data) as image:
+        embedding = compute_embedding(image)
+    return _worker_index.query(embedding)
+
+
+class JobResults:
+    """Job status shared by every server process through SQLite"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        reply TEXT,
+        reply_type TEXT,
+        created REAL NOT NULL,
+        finished REAL
+    ) WITHOUT ROWID
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(self.SCHEMA)
+
+    def _conn(self):
+        """Per-thread connection (re-opened after fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def put(self, job):
+        reply, reply_type = job['result'] or (None, None)
+        self._conn().execute(
+            'INSERT OR REPLACE INTO jobs (id, status, reply, reply_type, created, finished) VALUES (?, ?, ?, ?, ?, ?)',
+            (job['id'], job['status'], reply, reply_type, job['created'], job.get('finished'))
+        )
+
+    def get(self, job_id):
+        row = self._conn().execute(
+            'SELECT status, reply, reply_type, created, finished FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, reply, reply_type, created, finished = row
+        job = {'id': job_id, 'status': status, 'created': created, 'result': None}
+        if finished is not None:
+            job['result'], job['finished'] = (reply, reply_type), finished
+        return job
+
+    def expire(self, cutoff):
+        self._conn().execute('DELETE FROM jobs WHERE COALESCE(finished, created) < ?', (cutoff,))
+
+
+class RecognitionJobQueue:
+    """Bounded queue of recognition jobs.
+
+    `on_result(usn)` runs in the parent once a worker finishes and turns the
+    recognized USN (or None) into the (reply, type) pair stored on the job.
+    Given `results_path`, job status is mirrored to a shared JobResults table.
+    Worker processes are reniced by `nice` (0 leaves their priority alone).
+    A job still pending after `job_timeout` seconds is failed as timed out,
+    so a lost worker cannot hold a queue slot forever; a pool broken by a
+    dying worker is replaced on the next submit.
+    """
+
+    def __init__(self, index_args, on_result, max_workers=2, max_pending=32, result_ttl=300, results_path=None, nice=0,
+                 job_timeout=120):
+        self.index_args = index_args
+        self.on_result = on_result
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.nice = nice
+        self.result_ttl = result_ttl
+        self.job_timeout = job_timeout
+        self.jobs = {}
+        self.results = JobResults(results_path) if results_path else None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Created lazily so each serving process gets its own pool
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.nice,) + tuple(self.index_args)
+            )
+        return self._executor
+
+    def _discard_pool(self, executor):
+        """Drop a broken pool (caller holds the lock); the next submit starts a fresh one"""
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def pending(self):
+        with self._lock:
+            return self._pending()
+
+    def _pending(self):
+        # Caller holds the lock: submit() and _expire() change self.jobs from other threads
+        return sum(1 for job in self.jobs.values() if job['status'] == 'pending')
+
+    def submit(self, image_data, on_recognized=None):
+        """Queue a photo; returns the job id, or None if the queue is full.
+
+        `on_recognized(usn, score)` runs in the parent when the worker succeeds.
+        """
+        with self._lock:
+            self._expire()
+            if self._pending() >= self.max_pending:
+                return None
+            future = None
+            # A pool whose worker died refuses all work; retry once on a fresh one
+            for _ in range(2):
+                executor = self._pool()
+                try:
+                    future = executor.submit(recognize_in_worker, image_data)
+                    break
+                except BrokenProcessPool as e:
+                    log.error('recognition_pool_broken', extra={'error': str(e)})
+                    self._discard_pool(executor)
+            if future is None:
+                return None
+            job_id = uuid.uuid4().hex
+            job = {'id': job_id, 'status': 'pending', 'created': time.time(), 'result': None,
+                   'done': threading.Event()}
+            self.jobs[job_id] = job
+            # Shared before the callback is attached, so 'pending' never overwrites a result
+            self._share(job)
+        future.add_done_callback(lambda f: self._finish(job, f, executor, on_recognized))
+        return job_id
+
+    def _finish(self, job, future, executor, on_recognized=None):
+        try:
+            usn, score = future.result()
+            if on_recognized is not None:
+                on_recognized(usn, score)
+            status, result = 'done', self.on_result(usn)
+        except Exception as e:
+            log.error('recognition_job_failed', extra={'job_id': job['id'], 'error': str(e)})
+            status, result = 'error', FAILED_REPLY
+            if isinstance(e, BrokenProcessPool):
+                with self._lock:
+                    self._discard_pool(executor)
+        with self._lock:
+            self._complete(job, status, result)
+
+    def _complete(self, job, status, result):
+        """Record a pending job's outcome (caller holds the lock); a job already timed out keeps its reply"""
+        if job['status'] != 'pending':
+            return
+        job['result'], job['status'], job['finished'] = result, status, time.time()
+        self._share(job)
+        job['done'].set()
+
+    def _share(self, job):
+        if self.results is None:
+            return
+        try:
+            self.results.put(job)
+        except sqlite3.Error as e:
+            log.warning('job_result_not_shared', extra={'job_id': job['id'], 'error': str(e)})
+
+    def _expire(self):
+        now = time.time()
+        for job in list(self.jobs.values()):
+            if job['status'] == 'pending' and job['created'] < now - self.job_timeout:
+                log.warning('recognition_job_timed_out', extra={'job_id': job['id']})
+                self._complete(job, 'error', TIMED_OUT_REPLY)
+        cutoff = now - self.result_ttl
+        for job_id in [j['id'] for j in self.jobs.values() if j.get('finished', now) < cutoff]:
+            del self.jobs[job_id]
+        if self.results is not None:
+            try:
+                self.results.expire(cutoff)
+            except sqlite3.Error:
+                pass
+
+    def get(self, job_id):
+        """This process's job, else the shared copy of another worker's job, else None"""
+        job = self.jobs.get(job_id)
+        if job is None and self.results is not None:
+            job = self.results.get(job_id)
+        return job
+
+    def wait(self, job_id, timeout):
+        """Block up to timeout seconds for a job; returns the job or None if unknown"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job['done'].wait(timeout)
+            return job
+        # Another worker owns the job: poll the shared table
+        deadline = time.monotonic() + timeout
+        job = self.get(job_id)
+        while job is not None and job['status'] == 'pending' and time.monotonic() < deadline:
+            time.sleep(SHARED_POLL_INTERVAL)
+            job = self.get(job_id)
+        return job
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
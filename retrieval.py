@@ -0,0 +1,162 @@
+import numpy as np
+
+# best_matches scores queries in chunks so a dense block stays around this many entries
+SCORE_BLOCK_SIZE = 1 << 22
+
+
+class InvertedIndexRetriever:
+    """Top-k cosine retrieval over TF-IDF postings lists.
+
+    `postings` is the document matrix in CSC form: column t holds the
+    documents containing term t and their (L2-normalised) weights.  A query
+    only touches the postings of its own terms, so cost follows the query's
+    selectivity rather than the corpus size.
+
+    Terms are processed in decreasing order of their maximum possible
+    contribution.  Once the remaining terms cannot lift any document outside
+    the current top k above the k-th best partial score, accumulation stops
+    and only the k winners are rescored exactly.
+    """
+
+    def __init__(self, doc_matrix, postings):
+        self.doc_matrix = doc_matrix
+        self.postings = postings
+        self.n_docs = doc_matrix.shape[0]
+        indptr = postings.indptr
+        nonempty = np.diff(indptr) > 0
+        self.max_weight = np.zeros(postings.shape[1], dtype=np.float64)
+        if nonempty.any():
+            self.max_weight[nonempty] = np.maximum.reduceat(postings.data, indptr[:-1][nonempty])
+
+    def search(self, query_vector, k=5, min_score=0.0):
+        """Return [(doc_idx, score)] for the k best documents, best first"""
+        terms = query_vector.indices
+        if not len(terms) or not self.n_docs:
+            return []
+        k = min(k, self.n_docs)
+        query_weights = query_vector.data
+        bounds = query_weights * self.max_weight[terms]
+        order = np.argsort(-bounds)
+        remaining = np.concatenate([np.cumsum(bounds[order][::-1])[::-1][1:], [0.0]])
+
+        indptr, doc_ids, weights = self.postings.indptr, self.postings.indices, self.postings.data
+        candidates = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0, dtype=np.float64)
+        exact = True
+        for step, pos in enumerate(order):
+            term = terms[pos]
+            start, end = indptr[term], indptr[term + 1]
+            candidates, inverse = np.unique(np.concatenate([candidates, doc_ids[start:end]]), return_inverse=True)
+            scores = np.bincount(
+                inverse, weights=np.concatenate([scores, query_weights[pos] * weights[start:end]]),
+                minlength=len(candidates)
+            )
+            if step + 1 < len(order) and len(candidates) > k:
+                top = np.partition(scores, len(scores) - k - 1)[-k - 1:]
+                kth_best, runner_up = top[1:].min(), top[0]
+                if runner_up + remaining[step] < kth_best:
+                    exact = False
+                    break
+
+        if len(candidates) > k:
+            top = _top_k(scores, k)
+            candidates, scores = candidates[top], scores[top]
+        if not exact:
+            # Rescore the final winners against their full rows
+            scores = (self.doc_matrix[candidates] @ query_vector.T).toarray().ravel()
+
+        # Best score first; ties go to the earlier document, like np.argmax
+        ranked = np.lexsort((candidates, -scores))
+        return [(int(candidates[i]), float(scores[i])) for i in ranked if scores[i] > min_score]
+
+
+def _top_k(scores, k):
+    """Indices of the k largest scores, preferring lower indices on ties"""
+    kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)
+    return np.concatenate([above, ties[:k - len(above)]])
+
+
+class HybridRetriever:
+    """Blend lexical (TF-IDF) and semantic (LSA) cosine scores.
+
+    score = lexical_weight * lexical + (1 - lexical_weight) * max(semantic, 0)
+
+    Candidates are the union of the lexical top-n from the inverted index and
+    the semantic top-n from one dense matrix-vector product.
+    """
+
+    def __init__(self, lexical, lsa=None, lexical_weight=0.6, candidates=20):
+        self.lexical = lexical
+        self.lsa = lsa
+        self.lexical_weight = lexical_weight
+        self.candidates = candidates
+
+    def blend(self, lexical_scores, semantic_scores):
+        return self.lexical_weight * lexical_scores + (1 - self.lexical_weight) * np.maximum(semantic_scores, 0)
+
+    def search(self, query_vector, k=5, min_score=0.0):
+        """Return [(doc_idx, score)] for the k best documents, best first"""
+        if self.lsa is None:
+            return self.lexical.search(query_vector, k=k, min_score=min_score)
+        if not len(query_vector.indices) or not self.lexical.n_docs:
+            return []
+
+        n = min(max(k, self.candidates), self.lexical.n_docs)
+        lexical_hits = dict(self.lexical.search(query_vector, k=n))
+        semantic = self.lsa.scores(self.lsa.embed(query_vector))[:, 0]
+        semantic_top = _top_k(semantic, n)
+
+        candidates = np.union1d(np.fromiter(lexical_hits, dtype=np.int64, count=len(lexical_hits)), semantic_top)
+        lexical_scores = np.array([lexical_hits.get(int(doc), np.nan) for doc in candidates])
+        missing = np.isnan(lexical_scores)
+        if missing.any():
+            lexical_scores[missing] = (self.lexical.doc_matrix[candidates[missing]] @ query_vector.T).toarray().ravel()
+
+        scores = self.blend(lexical_scores, semantic[candidates].astype(np.float64))
+        ranked = np.lexsort((candidates, -scores))[:k]
+        return [(int(candidates[i]), float(scores[i])) for i in ranked if scores[i] > min_score]
+
+    def best_matches(self, query_matrix):
+        """Best (doc_idx, score) per query row, scored a block of queries at a time.
+
+        Lexical scores stay sparse.  With LSA, each chunk of queries gets one
+        dense block of semantic scores (at most about SCORE_BLOCK_SIZE
+        entries) and the sparse lexical scores are added onto it in place.
+        """
+        query_matrix = query_matrix.tocsr()
+        if self.lsa is None:
+            return _row_argmax((query_matrix @ self.lexical.doc_matrix.T).tocsr())
+        chunk = max(1, SCORE_BLOCK_SIZE // max(self.lexical.n_docs, 1))
+        best = []
+        for start in range(0, query_matrix.shape[0], chunk):
+            queries = query_matrix[start:start + chunk]
+            semantic = self.lsa.scores(self.lsa.embed(queries))
+            # Same sum as blend(), without densifying the lexical scores
+            np.maximum(semantic, 0, out=semantic)
+            semantic *= 1 - self.lexical_weight
+            scores = semantic.astype(np.float64)
+            del semantic
+            lexical = (self.lexical.doc_matrix @ queries.T).tocoo()
+            scores[lexical.row, lexical.col] += self.lexical_weight * lexical.data
+            docs = np.argmax(scores, axis=0)
+            best.extend((int(doc), float(scores[doc, col])) for col, doc in enumerate(docs))
+        return best
+
+
+def _row_argmax(matrix):
+    """(column, value) of the largest entry in each row of a non-negative CSR matrix, lowest column on ties"""
+    matrix.sort_indices()
+    counts = np.diff(matrix.indptr)
+    rows = np.flatnonzero(counts)
+    columns = np.zeros(matrix.shape[0], dtype=np.int64)
+    values = np.zeros(matrix.shape[0], dtype=np.float64)
+    if len(rows):
+        row_max = np.maximum.reduceat(matrix.data, matrix.indptr[rows])
+        # First stored entry equal to its row's maximum
+        hits = np.flatnonzero(matrix.data == np.repeat(row_max, counts[rows]))
+        hit_rows, first = np.unique(np.repeat(np.arange(matrix.shape[0]), counts)[hits], return_index=True)
+        columns[hit_rows] = matrix.indices[hits[first]]
+        values[hit_rows] = matrix.data[hits[first]]
+    return [(int(column), float(value)) for column, value in zip(columns, values)]
@@ -0,0 +1,50 @@
+import numpy as np
+
+LSA_COMPONENTS = 128
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def fit_lsa(doc_term_matrix, n_components=LSA_COMPONENTS):
+    """Fit a truncated SVD (LSA) basis; returns (term_vectors, doc_embeddings) or None.
+
+    term_vectors is (n_terms, k) so a sparse query projects by gathering only
+    the rows of its own terms; doc_embeddings are unit-length float32 rows.
+    """
+    from sklearn.decomposition import TruncatedSVD
+
+    n_docs, n_terms = doc_term_matrix.shape
+    n_components = min(n_components, n_docs - 1, n_terms - 1)
+    if n_components < 2:
+        return None
+    svd = TruncatedSVD(n_components=n_components, algorithm='randomized', random_state=0)
+    doc_embeddings = svd.fit_transform(doc_term_matrix)
+    return svd.components_.T.astype(np.float32), _normalize_rows(doc_embeddings)
+
+
+class LsaIndex:
+    """Dense semantic index: cosine similarity is one matrix-vector product"""
+
+    def __init__(self, term_vectors, doc_embeddings):
+        self.term_vectors = term_vectors
+        self.doc_embeddings = doc_embeddings
+
+    def embed(self, query_matrix):
+        """Project sparse TF-IDF query rows into the LSA space (unit-length float32)"""
+        # Gather only the query terms' rows: a sparse @ dense product would
+        # upcast (and so copy) the whole memory-mapped term matrix per call
+        indptr = query_matrix.indptr
+        projected = np.zeros((query_matrix.shape[0], self.term_vectors.shape[1]), dtype=np.float32)
+        nonempty = np.flatnonzero(np.diff(indptr))
+        if len(nonempty):
+            weighted = self.term_vectors[query_matrix.indices] * query_matrix.data[:, None].astype(np.float32)
+            projected[nonempty] = np.add.reduceat(weighted, indptr[nonempty], axis=0)
+        return _normalize_rows(projected)
+
+    def scores(self, query_embeddings):
+        """Cosine similarity of every document to each query: (n_docs, n_queries)"""
+        return self.doc_embeddings @ query_embeddings.T
@@ -0,0 +1,181 @@
+"""Typo correction for chat queries with a symmetric delete index (SymSpell).
+
+Voice transcripts and quick typing produce near misses ('admision',
+'placemant', 'hostle') that neither the keyword router nor TF-IDF can match.
+Instead of comparing an unknown word against the whole vocabulary, every
+known word is indexed under all the strings reachable by deleting up to
+`max_distance` characters from its first `prefix_length` letters.  A query
+word generates its own deletes, and only words sharing one of them are
+checked with a real edit distance, so the cost per word is independent of
+vocabulary size.
+
+Only words that are not English are corrected: english_words.txt lists
+common English words, so 'free', 'held' or 'hotel' are never turned into
+the nearest knowledge base term ('fee', 'help', 'hostel').  People's names
+(enrolled students) are left alone too, and so is any word shorter than
+five letters: too many of those ('amit', 'dcet') are a name or an acronym
+one edit away from a keyword ('admit', 'kcet').
+
+The index is built on first use (or by build()), not when the corrector is
+created, so constructing an engine stays as cheap as mapping its model.
+"""
+import functools, os, re, threading
+
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+# Shorter words are too ambiguous to correct; below LONG_WORD_LENGTH letters allow one edit
+MIN_WORD_LENGTH = 5
+LONG_WORD_LENGTH = 8
+CACHE_SIZE = 10000
+ENGLISH_WORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'english_words.txt')
+
+# Letters only, so USNs, numbers and punctuation pass through untouched
+WORD_PATTERN = re.compile(r'[a-z]+')
+
+
+def deletes(word, max_distance):
+    """Every string obtained by deleting up to max_distance characters from word"""
+    found = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+@functools.lru_cache(maxsize=None)
+def english_words(path=ENGLISH_WORDS_PATH):
+    """Correctly spelt English words, loaded once per process"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return frozenset(line.strip() for line in f if line.strip() and not line.startswith('#'))
+
+
+def within_one_edit(a, b):
+    """True if a and b differ by at most one substitution, insertion, deletion or adjacent swap"""
+    if len(a) < len(b):
+        a, b = b, a
+    if len(a) - len(b) > 1:
+        return False
+    i = 0
+    while i < len(b) and a[i] == b[i]:
+        i += 1
+    if len(a) != len(b):
+        return a[i + 1:] == b[i:]
+    return a[i + 1:] == b[i + 1:] or (a[i + 1:i + 2] == b[i:i + 1] and a[i:i + 1] == b[i + 1:i + 2]
+                                      and a[i + 2:] == b[i + 2:])
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (an adjacent swap is one edit), or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+class SpellingCorrector:
+    """Corrects unknown words to the closest known word.
+
+    `words` maps each correction target to a rank (or is a function
+    returning that mapping, called by build()); among equally close
+    candidates the highest rank wins.  Words in any of the `ignore` sets (or
+    sets returned by functions, called by build()) are known, never
+    corrected, but are not targets either, e.g. stop words and the English
+    dictionary.
+    """
+
+    def __init__(self, words, ignore=(), max_distance=MAX_EDIT_DISTANCE, prefix_length=PREFIX_LENGTH):
+        self._words = words
+        self.words = None
+        self._ignore = list(ignore)
+        self.ignore = None
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.index = None
+        self._build_lock = threading.Lock()
+        self._cache = {}
+
+    @classmethod
+    def for_vocabulary(cls, vectorizer, keywords, names=None):
+        """Targets: the TF-IDF vocabulary (common terms first) and intent keywords, which rank above it.
+
+        `names` is a function returning people's names, whose words are never corrected.
+        """
+        def words():
+            targets = {}
+            if vectorizer is not None:
+                for term, idf in zip(vectorizer.terms, vectorizer.idf_.tolist()):
+                    if ' ' not in term and term.isalpha():
+                        targets[term] = -idf
+            for keyword in keywords:
+                for word in WORD_PATTERN.findall(keyword):
+                    targets[word] = 0.0
+            return targets
+
+        ignore = [english_words()]
+        if vectorizer is not None:
+            ignore.append(vectorizer.stop_words)
+        if names is not None:
+            ignore.append(lambda: {word for name in names() for word in WORD_PATTERN.findall(name.lower())})
+        return cls(words, ignore=ignore)
+
+    def __len__(self):
+        return len(self.build().words)
+
+    def build(self):
+        """Build the delete index now instead of on the first lookup"""
+        if self.index is None:
+            with self._build_lock:
+                if self.index is None:
+                    words = dict(self._words() if callable(self._words) else self._words)
+                    self.ignore = [known() if callable(known) else known for known in self._ignore]
+                    index = {}
+                    for word in words:
+                        # Only words of LONG_WORD_LENGTH letters get more than one edit, so
+                        # shorter targets can never be that far from a query word
+                        distance = self.max_distance if len(word) >= LONG_WORD_LENGTH - self.max_distance else 1
+                        for key in deletes(word[:self.prefix_length], distance):
+                            index.setdefault(key, []).append(word)
+                    self.words = words
+                    self.index = index
+        return self
+
+    def correct_word(self, word):
+        """The closest known word, or word itself when it is known or nothing is close enough"""
+        if len(word) < MIN_WORD_LENGTH:
+            return word
+        self.build()
+        if word in self.words or any(word in known for known in self.ignore):
+            return word
+        corrected = self._cache.get(word)
+        if corrected is None:
+            corrected = self._lookup(word)
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            self._cache[word] = corrected
+        return corrected
+
+    def _lookup(self, word):
+        limit = 1 if len(word) < LONG_WORD_LENGTH else self.max_distance
+        candidates = set()
+        for key in deletes(word[:self.prefix_length], limit):
+            candidates.update(self.index.get(key, ()))
+        # Most typos are one edit away, which a linear scan confirms; the full
+        # edit distance only runs when nothing that close exists
+        close = [c for c in candidates if within_one_edit(word, c)]
+        if not close and limit > 1:
+            close = [c for c in candidates if edit_distance(word, c, limit) <= limit]
+        return max(close, key=lambda c: (self.words[c], c), default=word)
+
+    def correct(self, text):
+        """Lowercase text with every unknown word replaced by its correction"""
+        return WORD_PATTERN.sub(lambda m: self.correct_word(m.group(0)), text.lower())
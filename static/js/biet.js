@@ -582,10 +582,10 @@ class BIETChatbot {
         this.updateSendButtonState(true);
 
         try {
-            let imageBase64 = '';
+            let imageBlob = null;
             if (hasPhoto) {
-                imageBase64 = await this.convertImageToBase64(this.photoInput.files[0]);
-                this.addPhotoMessage(imageBase64, 'user');
+                imageBlob = await this.resizeImage(this.photoInput.files[0]);
+                this.addPhotoMessage(URL.createObjectURL(imageBlob), 'user');
             }
 
             if (message) {
@@ -597,11 +597,13 @@ class BIETChatbot {
 
             this.showTypingIndicator();
 
-            // Send message to backend API
-            const response = await this.sendToBackend(message, imageBase64);
-            
-            this.hideTypingIndicator();
-            this.addMessage(response.reply, 'bot', response.type);
+            // Stream the reply as it is produced; fall back to the plain JSON API
+            let response = await this.streamFromBackend(message, imageBlob);
+            if (!response) {
+                response = await this.sendToBackend(message, imageBlob);
+                this.hideTypingIndicator();
+                this.addMessage(response.reply, 'bot', response.type);
+            }
 
             // Auto-speak the response for important messages
             if (this.shouldSpeakResponse(response.reply)) {
@@ -620,27 +622,133 @@ class BIETChatbot {
         }
     }
 
-    async sendToBackend(message, imageData = '') {
-    const payload = {
-        message: message,
-        image: imageData
-    };
-
-    try {
-        const response = await fetch('/api/chat', {
+    buildChatRequest(message, imageBlob = null) {
+        if (imageBlob) {
+            // Binary multipart upload; the browser sets the boundary header
+            const form = new FormData();
+            form.append('message', message);
+            form.append('image', imageBlob, 'photo.jpg');
+            return { method: 'POST', body: form };
+        }
+        return {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify(payload)
-        });
+            body: JSON.stringify({ message: message })
+        };
+    }
+
+    async streamFromBackend(message, imageBlob = null) {
+        // Returns the rendered reply, or null if the caller should use sendToBackend
+        if (!window.ReadableStream || !window.TextDecoder) {
+            return null;
+        }
+
+        let response;
+        try {
+            response = await fetch('/api/chat/stream', this.buildChatRequest(message, imageBlob));
+        } catch (error) {
+            console.error('Error opening reply stream:', error);
+            return null;
+        }
+
+        // Errors found before streaming starts (bad photo, busy) come back as JSON
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.startsWith('text/event-stream') || !response.body) {
+            const data = await response.json().catch(() => ({}));
+            if (!data.reply) {
+                return null;
+            }
+            this.hideTypingIndicator();
+            this.addMessage(data.reply, 'bot', data.type);
+            return data;
+        }
+
+        const result = { reply: '', type: 'general', alternatives: [] };
+        let messageDiv = null;
+        const handleEvent = (event, data) => {
+            if (event === 'processing') {
+                this.setTypingText(data.reply);
+            } else if (event === 'meta') {
+                result.type = data.type;
+            } else if (event === 'chunk') {
+                result.reply += data.text;
+                // Student cards are HTML fragments, so they are shown once complete
+                if (result.type !== 'student_record') {
+                    this.hideTypingIndicator();
+                    if (messageDiv) {
+                        this.updateMessage(messageDiv, result.reply, result.type);
+                    } else {
+                        messageDiv = this.addMessage(result.reply, 'bot', result.type);
+                    }
+                }
+            } else if (event === 'done') {
+                result.alternatives = data.alternatives;
+                this.hideTypingIndicator();
+                if (!messageDiv) {
+                    messageDiv = this.addMessage(result.reply, 'bot', result.type);
+                }
+            }
+        };
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event: ')) {
+                        event = line.slice(7);
+                    } else if (line.startsWith('data: ')) {
+                        data += line.slice(6);
+                    }
+                }
+                // Lines starting with ':' are keep-alive comments
+                if (data) {
+                    handleEvent(event, JSON.parse(data));
+                }
+            }
+        }
+
+        if (!messageDiv) {
+            // The stream closed before the reply was complete
+            this.hideTypingIndicator();
+            if (!result.reply) {
+                result.reply = 'Sorry, I encountered an error. Please try again.';
+                result.type = 'error';
+            }
+            this.addMessage(result.reply, 'bot', result.type);
+        }
+        return result;
+    }
+
+    async sendToBackend(message, imageBlob = null) {
+    const request = this.buildChatRequest(message, imageBlob);
 
-        if (!response.ok) {
+    try {
+        const response = await fetch('/api/chat', request);
+        const data = await response.json().catch(() => ({}));
+
+        // Error replies (unreadable photo, upload too large, busy) carry a message
+        if (!response.ok && !data.reply) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const data = await response.json();
         console.log('Backend response:', data);
+
+        // Photo recognition runs as a background job on the server
+        if (data.type === 'job') {
+            return await this.waitForJob(data);
+        }
         return data;
 
     } catch (error) {
@@ -654,6 +762,55 @@ class BIETChatbot {
     }
 }
 
+waitForJob(job) {
+    return new Promise((resolve) => {
+        let settled = false;
+        const finish = (result) => {
+            if (!settled) {
+                settled = true;
+                resolve(result);
+            }
+        };
+
+        const poll = async (attempt = 0) => {
+            if (settled) return;
+            try {
+                const response = await fetch(job.poll_url);
+                const data = await response.json();
+                if (response.ok && data.status === 'pending' && attempt < 60) {
+                    setTimeout(() => poll(attempt + 1), 1000);
+                } else if (response.ok && data.status !== 'pending') {
+                    finish(data);
+                } else {
+                    finish({ reply: '❌ Photo recognition timed out. Please try again.', type: 'error' });
+                }
+            } catch (error) {
+                console.error('Error polling recognition job:', error);
+                finish({ reply: 'Sorry, I encountered an error. Please try again.', type: 'error' });
+            }
+        };
+
+        // Prefer Server-Sent Events; fall back to polling if the stream fails
+        if (!window.EventSource) {
+            poll();
+            return;
+        }
+        const events = new EventSource(job.events_url);
+        events.addEventListener('result', (e) => {
+            events.close();
+            finish(JSON.parse(e.data));
+        });
+        events.addEventListener('timeout', () => {
+            events.close();
+            poll();
+        });
+        events.onerror = () => {
+            events.close();
+            poll();
+        };
+    });
+}
+
 getFallbackResponse(message) {
     const lowerMessage = message.toLowerCase();
     
@@ -705,12 +862,25 @@ getFallbackResponse(message) {
         }
     }
 
-    convertImageToBase64(file) {
-        return new Promise((resolve, reject) => {
-            const reader = new FileReader();
-            reader.onload = (e) => resolve(e.target.result);
-            reader.onerror = (error) => reject(error);
-            reader.readAsDataURL(file);
+    resizeImage(file, maxSize = 640, quality = 0.85) {
+        // Downscale on the client so only a small JPEG goes over the wire
+        return new Promise((resolve) => {
+            const url = URL.createObjectURL(file);
+            const img = new Image();
+            img.onload = () => {
+                URL.revokeObjectURL(url);
+                const scale = Math.min(1, maxSize / Math.max(img.width, img.height));
+                const canvas = document.createElement('canvas');
+                canvas.width = Math.round(img.width * scale);
+                canvas.height = Math.round(img.height * scale);
+                canvas.getContext('2d').drawImage(img, 0, 0, canvas.width, canvas.height);
+                canvas.toBlob((blob) => resolve(blob || file), 'image/jpeg', quality);
+            };
+            img.onerror = () => {
+                URL.revokeObjectURL(url);
+                resolve(file);
+            };
+            img.src = url;
         });
     }
 
@@ -757,12 +927,28 @@ getFallbackResponse(message) {
     addMessage(content, sender, type = 'text') {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}-message`;
-        
-        const timestamp = new Date().toLocaleTimeString([], { 
+        messageDiv.dataset.sender = sender;
+        messageDiv.dataset.time = new Date().toLocaleTimeString([], { 
             hour: '2-digit', 
             minute: '2-digit'
         });
 
+        this.renderMessage(messageDiv, content, type);
+        this.chatMessages.appendChild(messageDiv);
+        this.scrollToBottom();
+        return messageDiv;
+    }
+
+    updateMessage(messageDiv, content, type = 'text') {
+        // Re-render a message whose content is still streaming in
+        this.renderMessage(messageDiv, content, type);
+        this.scrollToBottom();
+    }
+
+    renderMessage(messageDiv, content, type) {
+        const sender = messageDiv.dataset.sender;
+        const timestamp = messageDiv.dataset.time;
+
         if (type === 'student_record') {
             // Handle student record cards
             messageDiv.innerHTML = content;
@@ -787,9 +973,6 @@ getFallbackResponse(message) {
                 </div>
             `;
         }
-        
-        this.chatMessages.appendChild(messageDiv);
-        this.scrollToBottom();
     }
 
     formatMessageContent(content) {
@@ -854,6 +1037,13 @@ getFallbackResponse(message) {
         this.scrollToBottom();
     }
 
+    setTypingText(text) {
+        const typingText = document.querySelector('#typingIndicator .typing-text');
+        if (typingText) {
+            typingText.textContent = text;
+        }
+    }
+
     hideTypingIndicator() {
         const typingIndicator = document.getElementById('typingIndicator');
         if (typingIndicator) {
@@ -0,0 +1,301 @@
+"""Build and serve fingerprinted, precompressed static assets.
+
+The build writes every file under static/ (except uploads) to static/dist/
+with a content hash in its name, e.g. css/biet.css -> css/biet.3f9a0c1d2e.css,
+so browsers can cache it forever: a changed file gets a new name.  CSS, JS
+and SVG also get gzip (.gz) and brotli (.br) copies, which the server picks
+by Accept-Encoding without compressing per request.  Raster images under
+assets/ get WebP and AVIF variants at several widths for srcset.  url()
+references in CSS are rewritten to the hashed names, and a declaration using
+such an image is repeated with an image-set() of its AVIF/WebP variants.
+
+static/dist/manifest.json maps each source name to its build.  At runtime,
+AssetManifest answers with the hashed name only while the source is
+unchanged since the build, so an edited file is served from static/ as is
+until the next build.
+
+Build before deployment (and after editing anything under static/) with:
+
+    python static_assets.py
+
+Brotli output needs the Brotli package and AVIF needs a Pillow built with
+AVIF support; either is skipped with a warning when missing.
+"""
+import argparse, gzip, hashlib, io, json, mimetypes, os, posixpath, re, shutil, tempfile
+
+from structured_log import get_logger
+
+log = get_logger('static_assets')
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+BUILD_DIRNAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+SKIP_DIRS = {BUILD_DIRNAME, 'uploads'}
+HASH_LENGTH = 10
+
+COMPRESSIBLE = {'.css', '.js', '.svg'}
+# Keep a compressed copy only if it saves at least this fraction
+MIN_COMPRESSION_SAVING = 0.1
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+RESPONSIVE = {'.jpg', '.jpeg', '.png'}
+RESPONSIVE_WIDTHS = (120, 240, 480, 960, 1920)
+# (MIME type, Pillow format, file extension, encoder options), most efficient first
+IMAGE_FORMATS = [
+    ('image/avif', 'AVIF', '.avif', {'quality': 50}),
+    ('image/webp', 'WEBP', '.webp', {'quality': 80, 'method': 6}),
+]
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+# A declaration with a url() in its value, up to (not including) its closing ; or }
+CSS_DECLARATION = re.compile(r'(?P<lead>[{;]\s*)(?P<property>[-a-zA-Z]+)\s*:(?P<value>[^;{}]*\burl\([^;{}]*)(?=[;}])')
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(name, digest, suffix=None):
+    stem, ext = posixpath.splitext(name)
+    return f"{stem}.{digest}{suffix or ext}"
+
+
+def source_stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _image_formats():
+    from PIL import features
+    supported = []
+    for mime, pil_format, ext, options in IMAGE_FORMATS:
+        if features.check(pil_format.lower()):
+            supported.append((mime, pil_format, ext, options))
+        else:
+            log.warning('image_format_unsupported', extra={'format': pil_format})
+    return supported
+
+
+class AssetBuilder:
+    """Writes one build of static_dir into static_dir/dist"""
+
+    def __init__(self, static_dir=STATIC_DIR):
+        self.static_dir = static_dir
+        self.assets = {}
+        self.brotli = _brotli()
+        if self.brotli is None:
+            log.warning('brotli_unavailable', extra={'hint': 'pip install Brotli'})
+        self.image_formats = _image_formats()
+
+    def sources(self):
+        """Source names relative to static_dir; CSS last, so its url()s can point at hashed files"""
+        names = []
+        for root, dirs, files in os.walk(self.static_dir):
+            if root == self.static_dir:
+                dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+            dirs.sort()
+            for filename in sorted(files):
+                if not filename.startswith('.'):
+                    names.append(os.path.relpath(os.path.join(root, filename), self.static_dir).replace(os.sep, '/'))
+        return sorted(names, key=lambda name: name.endswith('.css'))
+
+    def build(self):
+        final_dir = os.path.join(self.static_dir, BUILD_DIRNAME)
+        # Write into a fresh directory and swap it in, so a running server never sees half a build
+        self.out_dir = tempfile.mkdtemp(prefix='.dist-', dir=self.static_dir)
+        try:
+            os.chmod(self.out_dir, 0o755)
+            for name in self.sources():
+                self.build_asset(name)
+            with open(os.path.join(self.out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+                json.dump({'version': MANIFEST_VERSION, 'assets': self.assets}, f, indent=2, sort_keys=True)
+            old_dir = None
+            if os.path.isdir(final_dir):
+                old_dir = tempfile.mkdtemp(prefix='.dist-old-', dir=self.static_dir)
+                os.replace(final_dir, os.path.join(old_dir, BUILD_DIRNAME))
+            os.replace(self.out_dir, final_dir)
+            if old_dir:
+                shutil.rmtree(old_dir, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(self.out_dir, ignore_errors=True)
+            raise
+        return self.assets
+
+    def build_asset(self, name):
+        path = os.path.join(self.static_dir, name)
+        stamp = source_stamp(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        ext = posixpath.splitext(name)[1].lower()
+        if ext == '.css':
+            data = self.rewrite_css(name, data.decode('utf-8')).encode('utf-8')
+
+        entry = {'file': hashed_name(name, content_hash(data)), 'source': stamp, 'encodings': []}
+        self.write(entry['file'], data)
+        if ext in COMPRESSIBLE:
+            entry['encodings'] = self.write_compressed(entry['file'], data)
+        if ext in RESPONSIVE:
+            entry.update(self.write_variants(name, path))
+        self.assets[name] = entry
+
+    def write(self, name, data):
+        path = os.path.join(self.out_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def write_compressed(self, name, data):
+        compressed = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+        if self.brotli is not None:
+            compressed['br'] = self.brotli.compress(data, quality=11)
+        encodings = []
+        for encoding in ('br', 'gzip'):
+            if encoding in compressed and len(compressed[encoding]) <= len(data) * (1 - MIN_COMPRESSION_SAVING):
+                self.write(name + ENCODING_SUFFIXES[encoding], compressed[encoding])
+                encodings.append(encoding)
+        return encodings
+
+    def write_variants(self, name, path):
+        """WebP/AVIF copies at each responsive width up to the original's"""
+        from PIL import Image, ImageOps
+
+        with Image.open(path) as image:
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+            width, height = image.size
+            widths = [w for w in RESPONSIVE_WIDTHS if w < width] + [width]
+            variants = {}
+            for target in widths:
+                resized = image if target == width else image.resize(
+                    (target, max(1, round(height * target / width))), Image.LANCZOS)
+                for mime, pil_format, ext, options in self.image_formats:
+                    buffer = io.BytesIO()
+                    resized.save(buffer, pil_format, **options)
+                    data = buffer.getvalue()
+                    variant = hashed_name(name, content_hash(data), f".{target}w{ext}")
+                    self.write(variant, data)
+                    variants.setdefault(mime, []).append([target, variant])
+        return {'width': width, 'height': height, 'variants': variants}
+
+    def rewrite_css(self, name, css):
+        """Point url()s at hashed files, keeping them relative to the stylesheet.
+
+        A declaration using an image with responsive variants is followed by a
+        copy using image-set() with the full-width AVIF/WebP variants and the
+        original; browsers without image-set() keep the plain url() one.
+        """
+        base = posixpath.dirname(name)
+
+        def entry_for(url):
+            if re.match(r'^([a-z]+:|/|#)', url):
+                return None
+            path = url.partition('?')[0]
+            return self.assets.get(posixpath.normpath(posixpath.join(base, path)))
+
+        def relative(built):
+            return posixpath.relpath(built, base or '.')
+
+        def replace(match):
+            quote, url = match.groups()
+            entry = entry_for(url)
+            if entry is None:
+                return match.group(0)
+            return f"url({quote}{relative(entry['file'])}{quote})"
+
+        def image_set(match):
+            entry = entry_for(match.group(2))
+            if entry is None or not entry.get('variants'):
+                return match.group(0)
+            candidates = [(relative(entry['variants'][mime][-1][1]), mime)
+                          for mime, _, _, _ in IMAGE_FORMATS if mime in entry['variants']]
+            candidates.append((relative(entry['file']), mimetypes.guess_type(entry['file'])[0]))
+            return 'image-set(' + ', '.join(f'url("{path}") type("{mime}")' for path, mime in candidates) + ')'
+
+        def add_image_set(match):
+            lead, prop, value = match.group('lead', 'property', 'value')
+            responsive = CSS_URL.sub(image_set, value)
+            if responsive == value:
+                return match.group(0)
+            return f"{match.group(0)};{lead[1:] or ' '}{prop}:{responsive}"
+
+        return CSS_URL.sub(replace, CSS_DECLARATION.sub(add_image_set, css))
+
+
+class AssetManifest:
+    """Runtime view of the last build: hashed names for templates, and what may be served from dist/"""
+
+    def __init__(self, static_dir=STATIC_DIR):
+        self.static_dir = static_dir
+        self.build_dir = os.path.join(static_dir, BUILD_DIRNAME)
+        self.assets = {}
+        self.files = {}
+
+    def load(self):
+        try:
+            with open(os.path.join(self.build_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            log.info('asset_manifest_missing', extra={'hint': 'python static_assets.py'})
+            return self
+        if manifest.get('version') != MANIFEST_VERSION:
+            log.warning('asset_manifest_outdated', extra={'hint': 'python static_assets.py'})
+            return self
+        self.assets = manifest['assets']
+        # Built file -> encodings it has precompressed copies for
+        for entry in self.assets.values():
+            self.files[entry['file']] = entry['encodings']
+            for variants in entry.get('variants', {}).values():
+                self.files.update((variant, []) for _, variant in variants)
+        log.info('asset_manifest_loaded', extra={'assets': len(self.assets), 'files': len(self.files)})
+        return self
+
+    def entry(self, name):
+        """The build of `name`, or None if there is none or the source changed since"""
+        entry = self.assets.get(name)
+        if entry is None:
+            return None
+        try:
+            if source_stamp(os.path.join(self.static_dir, name)) != entry['source']:
+                return None
+        except OSError:
+            return None
+        return entry
+
+    def path(self, name):
+        """Path under the static folder to link for `name`: its hashed build if current"""
+        entry = self.entry(name)
+        return f"{BUILD_DIRNAME}/{entry['file']}" if entry else name
+
+    def sources(self, name):
+        """[(MIME type, [(width, path under the static folder)])] of responsive variants, best first"""
+        entry = self.entry(name)
+        if entry is None:
+            return []
+        return [(mime, [(width, f"{BUILD_DIRNAME}/{variant}") for width, variant in entry['variants'][mime]])
+                for mime, _, _, _ in IMAGE_FORMATS if mime in entry.get('variants', {})]
+
+    def encodings(self, filename):
+        """Precompressed encodings for a built file, or None if dist/ has no such file"""
+        return self.files.get(filename)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build fingerprinted, precompressed static assets')
+    parser.add_argument('--static-dir', default=STATIC_DIR)
+    args = parser.parse_args()
+
+    assets = AssetBuilder(args.static_dir).build()
+    print(f"Static assets: {os.path.join(args.static_dir, BUILD_DIRNAME)}")
+    for name, entry in sorted(assets.items()):
+        extras = entry['encodings'] + [f"{len(v)} {mime.split('/')[1]}" for mime, v in entry.get('variants', {}).items()]
+        print(f"   - {name} -> {entry['file']}" + (f" ({', '.join(extras)})" if extras else ''))
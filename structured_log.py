@@ -0,0 +1,97 @@
+"""Non-blocking structured logging.
+
+Records are handed to a bounded in-memory queue and written as JSON lines by
+a listener thread, so a slow stdout never stalls a request.  If the queue is
+full the record is dropped (and counted) rather than blocking.  Extra fields
+passed with `extra={...}` become top-level JSON keys.
+"""
+import atexit, json, logging, logging.handlers, os, queue, sys, threading
+
+LOG_QUEUE_SIZE = 10000
+ROOT_LOGGER = 'biet'
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'event': record.getMessage()
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _STANDARD_ATTRS)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that owns its listener thread, restarting it after fork"""
+
+    def __init__(self, target, maxsize=LOG_QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize))
+        self.target = target
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A forked child inherits the queue but not the thread draining it
+            self.queue = queue.Queue(self.maxsize)
+            self._listener = logging.handlers.QueueListener(self.queue, self.target)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread; only merge the arguments here
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Stop the listener after it has written everything queued so far"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+
+_handler = None
+
+
+def configure(level=None, stream=None):
+    """Route the 'biet' loggers through the async JSON handler (idempotent)"""
+    global _handler
+    if _handler is None:
+        target = logging.StreamHandler(stream or sys.stdout)
+        target.setFormatter(JsonFormatter())
+        _handler = AsyncQueueHandler(target)
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.addHandler(_handler)
+        logger.propagate = False
+        atexit.register(_handler.flush)
+    logging.getLogger(ROOT_LOGGER).setLevel(level or os.environ.get('BIET_LOG_LEVEL', 'INFO').upper())
+    return _handler
+
+
+def dropped_records():
+    return _handler.dropped if _handler is not None else 0
+
+
+def get_logger(name):
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
@@ -0,0 +1,175 @@
+"""SQLite-backed student records.
+
+Records keep the same nested shape as the old in-memory STUDENT_DATABASE
+entries and are stored as JSON next to indexed lookup columns (USN, name,
+department).  Readers use one read-only connection per thread with
+memory-mapped I/O, so every worker shares the OS page cache instead of
+holding its own copy.
+
+Bulk import from CSV:
+
+    python student_store.py import students.csv [--db students.db]
+"""
+import argparse, csv, hashlib, json, os, re, sqlite3, threading
+
+MMAP_SIZE = 256 * 1024 * 1024
+USN_PATTERN = re.compile(r'\b([1-4][a-z]{2}\d{2}[a-z]{2,3}\d{3})\b', re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    usn TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    department TEXT NOT NULL DEFAULT '',
+    record TEXT NOT NULL,
+    record_hash TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_students_name ON students(name_key);
+CREATE INDEX IF NOT EXISTS idx_students_department ON students(department);
+"""
+
+CSV_FIELDS = ['usn', 'name', 'department', 'semester', 'email', 'phone', 'address', 'dob', 'blood_group',
+              'attendance', 'grades', 'current_cgpa']
+CSV_FEE_FIELDS = {'fee_status': 'status', 'fee_amount': 'amount', 'fee_due_date': 'due_date',
+                  'scholarship': 'scholarship'}
+CSV_SEMESTER_COLUMN = re.compile(r'^semester_(\d+)_(sgpa|backlogs)$')
+
+
+def record_hash(record):
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def find_usn(text):
+    """Return the first USN-shaped token in text (upper-cased), or None"""
+    match = USN_PATTERN.search(text or '')
+    return match.group(1).upper() if match else None
+
+
+def _number(value):
+    try:
+        return float(value) if '.' in value else int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def csv_row_to_record(row):
+    """Convert a flat CSV row into the nested student record shape.
+
+    Semester results come from `semester_<n>_sgpa` / `semester_<n>_backlogs`
+    columns and clubs from a ';'-separated `clubs` column.
+    """
+    record = {field: row[field].strip() for field in CSV_FIELDS if row.get(field)}
+    record['usn'] = record['usn'].upper()
+    record['id'] = record['usn']
+    if 'current_cgpa' in record:
+        record['current_cgpa'] = _number(record['current_cgpa'])
+
+    marks = {}
+    for column, value in row.items():
+        match = CSV_SEMESTER_COLUMN.match(column or '')
+        if match and value not in (None, ''):
+            marks.setdefault(f"semester_{match.group(1)}", {})[match.group(2)] = _number(value.strip())
+    record['marks'] = dict(sorted(marks.items(), key=lambda item: int(item[0].split('_')[1])))
+
+    record['fees'] = {key: row[column].strip() for column, key in CSV_FEE_FIELDS.items() if row.get(column)}
+    record['additional_info'] = {
+        'hostel': (row.get('hostel') or '').strip() or 'N/A',
+        'library_id': (row.get('library_id') or '').strip() or 'N/A',
+        'nss_volunteer': (row.get('nss_volunteer') or '').strip().lower() in ('1', 'true', 'yes', 'y'),
+        'club_membership': [club.strip() for club in (row.get('clubs') or '').split(';') if club.strip()]
+    }
+    return record
+
+
+class StudentStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._writer()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _writer(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _reader(self):
+        """Per-thread read-only connection (re-opened after fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute('PRAGMA query_only=ON')
+            conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def upsert_many(self, records):
+        """Insert or replace records in one transaction; returns the number written"""
+        rows = []
+        for r in records:
+            r = dict(r, usn=r['usn'].upper())
+            rows.append((r['usn'], r.get('name', ''), r.get('name', '').lower(), r.get('department', ''),
+                         json.dumps(r, ensure_ascii=False), record_hash(r)))
+        conn = self._writer()
+        try:
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO students (usn, name, name_key, department, record, record_hash) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', rows
+                )
+        finally:
+            conn.close()
+        return len(rows)
+
+    def import_csv(self, csv_path, batch_size=1000):
+        """Bulk-load students from a CSV file; returns the number imported"""
+        imported, batch = 0, []
+        with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                if not (row.get('usn') or '').strip():
+                    continue
+                batch.append(csv_row_to_record(row))
+                if len(batch) >= batch_size:
+                    imported += self.upsert_many(batch)
+                    batch = []
+        if batch:
+            imported += self.upsert_many(batch)
+        return imported
+
+    def get_by_usn(self, usn):
+        """Indexed primary-key lookup; returns the record dict or None"""
+        row = self._reader().execute('SELECT record FROM students WHERE usn = ?', (usn.upper(),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_record_hash(self, usn):
+        """Hash of the stored record (changes whenever the record does), or None"""
+        row = self._reader().execute('SELECT record_hash FROM students WHERE usn = ?', (usn.upper(),)).fetchone()
+        return row[0] if row else None
+
+    def directory(self):
+        """Lightweight [{'usn', 'name'}] listing, e.g. to match enrolment photos"""
+        rows = self._reader().execute('SELECT usn, name FROM students ORDER BY usn').fetchall()
+        return [{'usn': usn, 'name': name} for usn, name in rows]
+
+    def count(self):
+        return self._reader().execute('SELECT COUNT(*) FROM students').fetchone()[0]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the SQLite student store')
+    parser.add_argument('command', choices=['import', 'count'])
+    parser.add_argument('csv_path', nargs='?')
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'students.db'))
+    args = parser.parse_args()
+
+    store = StudentStore(args.db)
+    if args.command == 'import':
+        if not args.csv_path:
+            parser.error('import needs a CSV path')
+        print(f"Imported {store.import_csv(args.csv_path)} students into {args.db}")
+    print(f"Students in store: {store.count()}")
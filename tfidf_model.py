@@ -0,0 +1,283 @@
+"""Build, persist and memory-map the TF-IDF model used by ChatbotEngine.
+
+The fitted model is written once per knowledge base content hash into a
+versioned directory under model_cache/.  Workers load it with
+np.load(mmap_mode='r'), so all processes share the same page-cache copy and
+startup does not need to refit (or even import) scikit-learn.
+
+An optional LSA projection (truncated SVD of the same term space) is stored
+alongside as unit-normalised float32 matrices for semantic retrieval.
+
+Build ahead of deployment with:
+
+    python tfidf_model.py knowledge.json
+"""
+import argparse, hashlib, json, os, re, shutil, tempfile
+import numpy as np
+import scipy.sparse as sp
+
+from semantic import LsaIndex, fit_lsa
+from structured_log import get_logger
+
+# Bump whenever the artifact layout or corpus construction changes
+ARTIFACT_VERSION = 3
+ARTIFACT_PREFIX = 'tfidf-v'
+ARTIFACTS_TO_KEEP = 3
+NGRAM_RANGE = (1, 2)
+CATEGORIES = ['admissions', 'courses', 'fee_structure', 'placements', 'facilities', 'departments']
+
+# Same tokenisation as sklearn's default TfidfVectorizer analyzer
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+log = get_logger('tfidf_model')
+
+
+def kb_content_hash(kb):
+    """Content hash of the knowledge base, stable across key order and whitespace"""
+    payload = json.dumps(kb, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    digest = hashlib.sha256()
+    digest.update(f"{ARTIFACT_VERSION}:{NGRAM_RANGE}:".encode('utf-8'))
+    digest.update(payload.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def extract_key_terms(text):
+    """Extract key terms from text to create synthetic questions"""
+    # Remove emojis and special characters
+    clean_text = re.sub(r'[^\w\s]', ' ', text)
+    words = clean_text.split()
+
+    # Filter out common words and get meaningful terms
+    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
+    key_terms = [word for word in words if word.lower() not in stop_words and len(word) > 3]
+
+    return ' '.join(key_terms[:4]) if key_terms else None
+
+
+def build_corpus(kb):
+    """Prepare questions and answers for TF-IDF"""
+    questions = []
+    answers = []
+
+    # Add QA pairs from knowledge base
+    for qa in kb.get('qa_pairs', []):
+        questions.append(qa['question'])
+        answers.append(qa['answer'])
+
+    # Add category-based questions
+    for category in CATEGORIES:
+        for item in kb.get(category, []):
+            # Extract key terms to create synthetic questions
+            key_terms = extract_key_terms(item)
+            if key_terms:
+                questions.append(f"what is {key_terms}")
+                answers.append(f"**{category.replace('_', ' ').title()}:**\n\n{item}")
+
+    return questions, answers
+
+
+class TfidfQueryVectorizer:
+    """Transform-only replacement for a fitted sklearn TfidfVectorizer.
+
+    Reproduces the default word analyzer (lowercase, token pattern, stop word
+    removal, then n-grams), raw term counts, the fitted IDF weights and L2
+    normalisation, without importing sklearn.
+    """
+
+    def __init__(self, terms, idf, stop_words, ngram_range=NGRAM_RANGE):
+        self.terms = terms
+        self.vocabulary_ = {term: idx for idx, term in enumerate(terms)}
+        self.idf_ = idf
+        self.stop_words = frozenset(stop_words)
+        self.ngram_range = tuple(ngram_range)
+
+    def analyze(self, text):
+        tokens = [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in self.stop_words]
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        grams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), max_n + 1):
+            grams.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+
+    def transform(self, raw_documents):
+        indptr, indices, data = [0], [], []
+        vocabulary = self.vocabulary_
+        for text in raw_documents:
+            counts = {}
+            for gram in self.analyze(text):
+                idx = vocabulary.get(gram)
+                if idx is not None:
+                    counts[idx] = counts.get(idx, 0) + 1
+            if counts:
+                cols = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+                weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * self.idf_[cols]
+                weights /= np.sqrt(np.dot(weights, weights))
+                order = np.argsort(cols)
+                indices.append(cols[order])
+                data.append(weights[order])
+            indptr.append(indptr[-1] + len(counts))
+        return sp.csr_matrix(
+            (np.concatenate(data) if data else np.zeros(0),
+             np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+             np.asarray(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, len(self.terms))
+        )
+
+
+class TfidfModel:
+    """Fitted TF-IDF state: corpus, query vectorizer, document matrix and postings"""
+
+    def __init__(self, content_hash, questions, answers, vectorizer, tfidf_matrix, postings=None, lsa=None,
+                 path=None):
+        self.content_hash = content_hash
+        self.questions = questions
+        self.answers = answers
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        # Same matrix in CSC form: per-term postings lists for the inverted index
+        self.postings = postings
+        # Optional LsaIndex for the semantic half of hybrid retrieval
+        self.lsa = lsa
+        self.path = path
+
+
+def artifact_dir(cache_dir, content_hash):
+    return os.path.join(cache_dir, f"{ARTIFACT_PREFIX}{ARTIFACT_VERSION}-{content_hash[:16]}")
+
+
+def fit_model(kb, content_hash=None):
+    """Fit a TF-IDF model from scratch (imports sklearn lazily)"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    content_hash = content_hash or kb_content_hash(kb)
+    questions, answers = build_corpus(kb)
+    if not questions:
+        return TfidfModel(content_hash, questions, answers, None, None)
+
+    fitted = TfidfVectorizer(stop_words='english', ngram_range=NGRAM_RANGE)
+    matrix = fitted.fit_transform(questions).tocsr()
+    matrix.sort_indices()
+    postings = matrix.tocsc()
+    postings.sort_indices()
+    terms = [None] * len(fitted.vocabulary_)
+    for term, idx in fitted.vocabulary_.items():
+        terms[idx] = term
+    vectorizer = TfidfQueryVectorizer(terms, fitted.idf_, fitted.get_stop_words(), NGRAM_RANGE)
+
+    # The LSA basis is learnt from question + answer text so that words which
+    # only co-occur in answers (e.g. 'year' with fees) still relate questions
+    lsa = fit_lsa(vectorizer.transform([f"{q} {a}" for q, a in zip(questions, answers)]))
+    lsa = LsaIndex(*lsa) if lsa else None
+    return TfidfModel(content_hash, questions, answers, vectorizer, matrix, postings, lsa)
+
+
+def save_model(model, cache_dir):
+    """Write the artifact into a temp dir and rename it into place atomically"""
+    target = artifact_dir(cache_dir, model.content_hash)
+    if os.path.isdir(target):
+        return target
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.tfidf-', dir=cache_dir)
+    try:
+        matrix = model.tfidf_matrix
+        vectorizer = model.vectorizer
+        np.save(os.path.join(tmp, 'data.npy'), matrix.data)
+        np.save(os.path.join(tmp, 'indices.npy'), matrix.indices)
+        np.save(os.path.join(tmp, 'indptr.npy'), matrix.indptr)
+        np.save(os.path.join(tmp, 'postings_data.npy'), model.postings.data)
+        np.save(os.path.join(tmp, 'postings_indices.npy'), model.postings.indices)
+        np.save(os.path.join(tmp, 'postings_indptr.npy'), model.postings.indptr)
+        np.save(os.path.join(tmp, 'idf.npy'), vectorizer.idf_)
+        if model.lsa is not None:
+            np.save(os.path.join(tmp, 'lsa_terms.npy'), model.lsa.term_vectors)
+            np.save(os.path.join(tmp, 'lsa_docs.npy'), model.lsa.doc_embeddings)
+        with open(os.path.join(tmp, 'model.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'artifact_version': ARTIFACT_VERSION,
+                'content_hash': model.content_hash,
+                'shape': list(matrix.shape),
+                'ngram_range': list(vectorizer.ngram_range),
+                'stop_words': sorted(vectorizer.stop_words),
+                'terms': vectorizer.terms,
+                'questions': model.questions,
+                'answers': model.answers
+            }, f, ensure_ascii=False)
+        os.rename(tmp, target)
+    except OSError:
+        # Another worker won the race, or the cache dir is read-only
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(target):
+            raise
+    prune_artifacts(cache_dir, keep=target)
+    return target
+
+
+def prune_artifacts(cache_dir, keep):
+    """Remove all but the newest artifacts (mapped files stay valid until unmapped)"""
+    candidates = [
+        os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+        if name.startswith(ARTIFACT_PREFIX)
+    ]
+    candidates.sort(key=os.path.getmtime, reverse=True)
+    stale = [path for path in candidates if path != keep][ARTIFACTS_TO_KEEP - 1:]
+    for path in stale:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def load_model(path):
+    """Memory-map a saved artifact"""
+    with open(os.path.join(path, 'model.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('artifact_version') != ARTIFACT_VERSION:
+        raise ValueError(f"Unsupported TF-IDF artifact version in {path}")
+    load = lambda name: np.load(os.path.join(path, name), mmap_mode='r')
+    matrix = sp.csr_matrix(
+        (load('data.npy'), load('indices.npy'), load('indptr.npy')),
+        shape=tuple(meta['shape']), copy=False
+    )
+    postings = sp.csc_matrix(
+        (load('postings_data.npy'), load('postings_indices.npy'), load('postings_indptr.npy')),
+        shape=tuple(meta['shape']), copy=False
+    )
+    vectorizer = TfidfQueryVectorizer(meta['terms'], load('idf.npy'), meta['stop_words'], meta['ngram_range'])
+    lsa = None
+    if os.path.exists(os.path.join(path, 'lsa_docs.npy')):
+        lsa = LsaIndex(load('lsa_terms.npy'), load('lsa_docs.npy'))
+    return TfidfModel(meta['content_hash'], meta['questions'], meta['answers'], vectorizer, matrix, postings, lsa,
+                      path)
+
+
+def load_or_build(kb, cache_dir):
+    """Map the artifact for this knowledge base, refitting only if its hash changed"""
+    content_hash = kb_content_hash(kb)
+    path = artifact_dir(cache_dir, content_hash)
+    if os.path.isdir(path):
+        try:
+            return load_model(path)
+        except (OSError, ValueError, KeyError) as e:
+            log.warning('tfidf_artifact_unreadable', extra={'path': path, 'error': str(e)})
+
+    model = fit_model(kb, content_hash)
+    if model.vectorizer is None:
+        return model
+    try:
+        return load_model(save_model(model, cache_dir))
+    except OSError as e:
+        log.warning('tfidf_artifact_not_saved', extra={'error': str(e)})
+        return model
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the TF-IDF artifact for a knowledge base')
+    parser.add_argument('knowledge', nargs='?', default='knowledge.json')
+    parser.add_argument('--cache-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_cache'))
+    args = parser.parse_args()
+
+    with open(args.knowledge, 'r', encoding='utf-8') as f:
+        kb = json.load(f)
+    model = load_or_build(kb, args.cache_dir)
+    print(f"TF-IDF artifact: {model.path}")
+    print(f"   - Questions: {len(model.questions)}")
+    print(f"   - Terms: {len(model.vectorizer.terms) if model.vectorizer else 0}")
@@ -0,0 +1,317 @@
+"""Content-addressed store for uploaded photos and their recognition results.
+
+Every upload is keyed by the SHA-256 of its bytes and carries a 64-bit
+difference hash (dHash) of its thumbnail.  A byte-identical upload is found
+by digest, a re-encoded or slightly resized copy of the same photo by a small
+Hamming distance between dHashes; either way the stored recognition result is
+reused instead of running recognition again.
+
+An upload is stored (its file queued for writing) when recognition is
+submitted, and its result recorded when recognition finishes, so the bytes
+are not kept in memory while the job runs; an entry without a result is
+never served.  Files are written once, as <dir>/<digest[:2]>/<digest>, by a
+background writer thread, so requests never wait on disk.  Results are
+tagged with the face index version and ignored once the enrolled photos
+change.
+
+The index lives in SQLite (<dir>/index.db), shared by every server
+process, so the bound on total size and on age since an entry was last
+used (least recently used entries go first) holds for the store as a
+whole.  Loading reconciles the index with the files on disk: rows whose
+file is gone are dropped and files no row knows are deleted.  Hit and miss
+counters are per process.  A max_bytes of 0 disables storing.
+"""
+import glob, os, queue, re, sqlite3, threading, time
+import numpy as np
+from PIL import Image
+
+from structured_log import get_logger
+
+DHASH_SIZE = 8
+# Hamming distance (of 64 bits) at which two uploads count as the same photo
+NEAR_DUPLICATE_BITS = 4
+# A dHash with fewer set (or clear) bits than this comes from a nearly flat image, e.g.
+# a solid colour hashes to 0, and would match unrelated flat photos
+MIN_DHASH_BITS = 8
+INDEX_FILE = 'index.db'
+# The JSON index of earlier versions, removed on load
+LEGACY_INDEX_FILE = 'index.json'
+WRITE_QUEUE_SIZE = 256
+# Rows and files younger than this may belong to a write still in flight elsewhere
+RECONCILE_GRACE = 300
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+log = get_logger('upload_store')
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def dhash(image, size=DHASH_SIZE):
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 grayscale image"""
+    gray = np.asarray(image.convert('L').resize((size + 1, size), Image.BILINEAR), dtype=np.int16)
+    bits = np.packbits((gray[:, 1:] > gray[:, :-1]).ravel())
+    return int.from_bytes(bits.tobytes(), 'big')
+
+
+def distinctive(phash, size=DHASH_SIZE):
+    """True unless the dHash is (nearly) all zeros or all ones"""
+    bits = bin(phash).count('1')
+    return MIN_DHASH_BITS <= bits <= size * size - MIN_DHASH_BITS
+
+
+def _signed(phash):
+    """SQLite integers are signed 64-bit"""
+    return phash - (1 << 64) if phash >= 1 << 63 else phash
+
+
+class UploadStore:
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS uploads (
+        digest TEXT PRIMARY KEY,
+        dhash INTEGER NOT NULL,
+        usn TEXT,
+        score REAL,
+        index_key TEXT,
+        size INTEGER NOT NULL,
+        stored REAL NOT NULL,
+        used REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS uploads_used ON uploads (used);
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID;
+    INSERT OR IGNORE INTO meta (key, value) VALUES ('hashes_version', 0);
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, max_age=30 * 24 * 3600, index_key=''):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.index_key = index_key
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._hash_keys = []
+        self._hash_values = np.zeros(0, dtype=np.uint64)
+        self._hashes_version = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._writer_pid = None
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _conn(self):
+        """Per-thread connection (re-opened after fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(os.path.join(self.directory, INDEX_FILE), timeout=5, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self):
+        """Create the index if needed and reconcile it with the files on disk"""
+        os.makedirs(self.directory, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        try:
+            os.remove(os.path.join(self.directory, LEGACY_INDEX_FILE))
+        except FileNotFoundError:
+            pass
+        settled = time.time() - RECONCILE_GRACE
+        known = {digest: stored for digest, stored in conn.execute('SELECT digest, stored FROM uploads')}
+        on_disk = set()
+        for path in glob.glob(os.path.join(self.directory, '??', '*')):
+            name = os.path.basename(path)
+            if name in known:
+                on_disk.add(name)
+                continue
+            try:
+                # Unknown files (and temp files of interrupted writes) would never be counted or evicted
+                if DIGEST_PATTERN.match(name) or os.path.getmtime(path) < settled:
+                    os.remove(path)
+            except OSError:
+                pass
+        missing = [(digest,) for digest, stored in known.items() if digest not in on_disk and stored < settled]
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('DELETE FROM uploads WHERE digest = ?', missing)
+            if missing:
+                self._bump(conn)
+            evicted = self._evict(conn)
+        self._delete_files(evicted)
+        log.info('upload_store_loaded', extra={'entries': len(known) - len(missing) - len(evicted),
+                                               'dropped': len(missing), 'evicted': len(evicted)})
+        return self
+
+    def lookup(self, digest, phash=None):
+        """Cached entry for an identical (or, given its dHash, near-identical) upload, or None"""
+        conn = self._conn()
+        entry = self._get(conn, digest)
+        if entry is not None and entry['index_key'] == self.index_key:
+            with self._lock:
+                self.exact_hits += 1
+        elif phash is None:
+            return None
+        else:
+            # Only byte-identical copies of a featureless photo are safe to reuse
+            nearest = self._nearest(conn, phash) if distinctive(phash) else None
+            entry = self._get(conn, nearest) if nearest else None
+            with self._lock:
+                if entry is None:
+                    self.misses += 1
+                    return None
+                self.near_hits += 1
+        entry['used'] = time.time()
+        conn.execute('UPDATE uploads SET used = ? WHERE digest = ?', (entry['used'], entry['digest']))
+        return entry
+
+    def _get(self, conn, digest):
+        row = conn.execute(
+            'SELECT digest, dhash, usn, score, index_key, size, stored, used FROM uploads WHERE digest = ?', (digest,)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = dict(zip(('digest', 'dhash', 'usn', 'score', 'index_key', 'size', 'stored', 'used'), row))
+        entry['dhash'] %= 1 << 64
+        return entry
+
+    def _nearest(self, conn, phash):
+        """Digest of the closest current upload within NEAR_DUPLICATE_BITS, or None"""
+        version = conn.execute("SELECT value FROM meta WHERE key = 'hashes_version'").fetchone()[0]
+        with self._lock:
+            if version != self._hashes_version:
+                rows = conn.execute('SELECT digest, dhash FROM uploads WHERE index_key = ?', (self.index_key,))
+                current = [(digest, value % (1 << 64)) for digest, value in rows if distinctive(value % (1 << 64))]
+                self._hash_keys = [digest for digest, _ in current]
+                self._hash_values = np.array([value for _, value in current], dtype=np.uint64)
+                self._hashes_version = version
+            keys, values = self._hash_keys, self._hash_values
+        if not keys:
+            return None
+        diff = (values ^ np.uint64(phash)).view(np.uint8).reshape(-1, 8)
+        distances = _POPCOUNT[diff].sum(axis=1, dtype=np.int32)
+        best = int(np.argmin(distances))
+        if distances[best] > NEAR_DUPLICATE_BITS:
+            return None
+        return keys[best]
+
+    @staticmethod
+    def _bump(conn):
+        # Tells every process its cached dHash array is stale
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'hashes_version'")
+
+    def store(self, digest, phash, data):
+        """Register an upload awaiting its result; the file itself is written in the background"""
+        if self.max_bytes <= 0:
+            return
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # No index_key until record(), so lookups skip the entry
+            added = conn.execute(
+                'INSERT OR IGNORE INTO uploads (digest, dhash, size, stored, used) VALUES (?, ?, ?, ?, ?)',
+                (digest, _signed(phash), len(data), now, now)
+            ).rowcount
+            evicted = self._evict(conn)
+        if added:
+            self._enqueue(('write', digest, data))
+        self._delete_files(evicted)
+
+    def record(self, digest, usn, score):
+        """Attach a recognition result to a stored upload (ignored if it has been evicted since)"""
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            updated = conn.execute(
+                'UPDATE uploads SET usn = ?, score = ?, index_key = ?, used = ? WHERE digest = ?',
+                (usn, score, self.index_key, time.time(), digest)
+            ).rowcount
+            if updated:
+                self._bump(conn)
+
+    def discard(self, digest):
+        """Forget an upload stored for a job that was never run"""
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            deleted = conn.execute('DELETE FROM uploads WHERE digest = ?', (digest,)).rowcount
+            if deleted:
+                self._bump(conn)
+        if deleted:
+            self._delete_files([digest])
+
+    def _evict(self, conn):
+        """Delete expired and least recently used rows over the size bound (in the caller's transaction)"""
+        cutoff = time.time() - self.max_age
+        evicted = [digest for (digest,) in conn.execute('SELECT digest FROM uploads WHERE used < ?', (cutoff,))]
+        conn.execute('DELETE FROM uploads WHERE used < ?', (cutoff,))
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM uploads').fetchone()[0]
+        if total > self.max_bytes:
+            over = []
+            for digest, size in conn.execute('SELECT digest, size FROM uploads ORDER BY used'):
+                if total <= self.max_bytes:
+                    break
+                over.append(digest)
+                total -= size
+            conn.executemany('DELETE FROM uploads WHERE digest = ?', [(digest,) for digest in over])
+            evicted += over
+        if evicted:
+            self._bump(conn)
+        return evicted
+
+    def _delete_files(self, digests):
+        for digest in digests:
+            self._enqueue(('delete', digest, None))
+
+    def _enqueue(self, task):
+        if self._writer_pid != os.getpid():
+            # Threads do not survive fork: start one writer per process
+            self._writer_pid = os.getpid()
+            threading.Thread(target=self._write_loop, name='upload-store-writer', daemon=True).start()
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            log.warning('upload_store_queue_full', extra={'action': task[0], 'digest': task[1]})
+
+    def _write_loop(self):
+        while True:
+            action, digest, data = self._queue.get()
+            try:
+                if action == 'write':
+                    self._write_file(digest, data)
+                elif action == 'delete':
+                    try:
+                        os.remove(self.path_for(digest))
+                    except FileNotFoundError:
+                        pass
+            except OSError as e:
+                log.error('upload_store_write_failed', extra={'error': str(e)})
+
+    def _write_file(self, digest, data):
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        entries, total = self._conn().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM uploads').fetchone()
+        lookups = self.exact_hits + self.near_hits + self.misses
+        return {
+            'entries': entries,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'exact_hits': self.exact_hits,
+            'near_hits': self.near_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.exact_hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+            'pending_writes': self._queue.qsize()
+        }
@@ -0,0 +1,36 @@
+"""Production WSGI entry point for pre-fork servers.
+
+    gunicorn -c gunicorn.conf.py 'wsgi:create_app()'
+
+With preload_app (see gunicorn.conf.py) create_app() runs once in the master:
+the knowledge base, the memory-mapped TF-IDF/LSA artifact, the student store
+and the face index are loaded and warmed up there, then every forked worker
+shares those pages copy-on-write.  gc.freeze() moves the loaded objects into
+the permanent generation so the collector never touches (and so never
+copies) them in the workers.
+
+Per-process state is recreated lazily after fork: SQLite connections, the
+log listener thread, the upload store writer and the recognition process
+pool.  post_fork() in gunicorn.conf.py starts each worker's knowledge base
+watcher.
+"""
+import gc
+
+
+def create_app():
+    # Nothing allocated while loading needs collecting; skip the GC passes
+    gc.disable()
+    try:
+        import app as chatbot
+        chatbot.warm_up()
+    finally:
+        gc.collect()
+        gc.freeze()
+        gc.enable()
+    return chatbot.app
+
+
+def start_worker():
+    """Per-worker setup after fork (threads do not survive fork)"""
+    import app as chatbot
+    chatbot.kb_manager.start_watcher(chatbot.KB_WATCH_INTERVAL)